@@ -0,0 +1,106 @@
+"""
+Reading products one by one through the client SDK versus hand-rolled calls.
+
+Serves the app in-process (uvicorn in a thread, over local TCP) and
+reads the same products with: new connection per call, sync Client
+with pooled keep-alive connections, AsyncClient whose concurrent single
+reads are batched into multi-get requests.
+
+Usage (DATABASE_URL should point to prepared database):
+    poetry run python benchmarks/client.py --reads 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from warehouse_client import AsyncClient, Client  # noqa: E402
+from warehouse_manager.app import app  # noqa: E402
+
+
+def serve(host: str, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=host, port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8766)
+    opts = parser.parse_args()
+    url = f"http://127.0.0.1:{opts.port}"
+    server = serve("127.0.0.1", opts.port)
+
+    with Client(url) as api:
+        run = uuid.uuid4().hex[:8]
+        pks = [
+            api.create_product(
+                {"name": f"bench-{run}-{i}", "description": "-", "price": 1}
+            ).id
+            for i in range(opts.products)
+        ]
+    reads = [pks[i % len(pks)] for i in range(opts.reads)]
+
+    def per_call_connection():
+        for pk in reads:
+            httpx.get(f"{url}/products/{pk}/").raise_for_status()
+
+    def pooled():
+        with Client(url) as api:
+            for pk in reads:
+                api.get_product(pk)
+
+    async def naive_concurrent():
+        slots = asyncio.Semaphore(opts.concurrency)
+
+        async def read(pk):
+            async with slots, httpx.AsyncClient() as http:
+                response = await http.get(f"{url}/products/{pk}/")
+                response.raise_for_status()
+
+        await asyncio.gather(*(read(pk) for pk in reads))
+
+    async def batched():
+        async with AsyncClient(url, max_concurrency=opts.concurrency) as api:
+            await asyncio.gather(*(api.get_product(pk) for pk in reads))
+
+    rows = [
+        ("sync, connection per call", timed(per_call_connection)),
+        ("sync Client, pooled", timed(pooled)),
+        (
+            "async, connection per call",
+            timed(lambda: asyncio.run(naive_concurrent())),
+        ),
+        ("AsyncClient, batched", timed(lambda: asyncio.run(batched()))),
+    ]
+    server.should_exit = True
+
+    print(f"{'':<28} {'reads/s':>10}")
+    for name, seconds in rows:
+        print(f"{name:<28} {opts.reads / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Latency of first requests to freshly started worker, with and without warm-up.
+
+Starts gunicorn (see gunicorn.conf.py) with one worker, waits until it
+is live (warm-up disabled) or ready (warm-up enabled), like a load
+balancer would, and times its first requests. Every mode is started
+several times and median latencies are printed.
+
+Usage (DATABASE_URL should point to prepared database):
+    poetry run python benchmarks/first_request.py --runs 5
+"""
+
+import argparse
+import http.client
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for(host: str, port: int, path: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"server isn't up at {path}")
+
+
+def first_requests(warmup: bool, opts: argparse.Namespace) -> list[float]:
+    """:return: latencies of first requests in ms"""
+
+    env = dict(os.environ, WEB_CONCURRENCY="1")
+    env["BIND"] = f"{opts.host}:{opts.port}"
+    env["WARMUP_ENABLED"] = "1" if warmup else "0"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "gunicorn.conf.py",
+            "--access-logfile",
+            "/dev/null",
+            "warehouse_manager.app:app",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        wait_for(
+            opts.host, opts.port, "/health/ready" if warmup else "/health/live"
+        )
+        conn = http.client.HTTPConnection(opts.host, opts.port)
+        latencies = []
+        for path in opts.paths:
+            started = time.perf_counter()
+            conn.request("GET", path)
+            conn.getresponse().read()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--paths",
+        nargs="+",
+        default=["/products/1/", "/orders/1/", "/products/1/"],
+    )
+    opts = parser.parse_args()
+
+    print(f"{'warm-up':>8} " + " ".join(f"{p:>14}" for p in opts.paths))
+    for warmup in (False, True):
+        runs = [first_requests(warmup, opts) for _ in range(opts.runs)]
+        medians = [statistics.median(latencies) for latencies in zip(*runs)]
+        print(
+            f"{'on' if warmup else 'off':>8} "
+            + " ".join(f"{ms:>11.2f} ms" for ms in medians)
+        )
+
+
+if __name__ == "__main__":
+    main()
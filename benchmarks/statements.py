@@ -0,0 +1,125 @@
+"""
+Per-call cost of hot lookup statement, rebuilt on every call or built once.
+
+Measures Python side (building the select, its cache key and compiling
+it to SQL, with and without compiled cache) and database side (parsing
+and planning the query on every execution versus executing statement
+prepared server-side).
+
+Usage (DATABASE_URL should point to prepared database):
+    poetry run python benchmarks/statements.py --calls 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+from sqlalchemy import select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from warehouse_manager import crud, models  # noqa: E402
+from warehouse_manager.database import SessionLocal, engine  # noqa: E402
+
+
+def per_call(fn: Callable[[], object], calls: int) -> float:
+    """:return: microseconds per call"""
+
+    fn()
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def rebuilt(product_id: int):
+    return select(models.Product).where(
+        models.Product.id == product_id, crud._live
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=5000)
+    opts = parser.parse_args()
+
+    db = SessionLocal()
+    product = db.execute(select(models.Product).limit(1)).scalar()
+    if product is None:
+        sys.exit("database has no products")
+    pk = product.id
+    dialect = engine.dialect
+
+    rows = [
+        (
+            "build + cache key, rebuilt",
+            per_call(lambda: rebuilt(pk)._generate_cache_key(), opts.calls),
+        ),
+        (
+            "build + cache key, built once",
+            per_call(
+                lambda: crud._product_by_id._generate_cache_key(), opts.calls
+            ),
+        ),
+        (
+            "compile to SQL (cache miss)",
+            per_call(lambda: rebuilt(pk).compile(dialect=dialect), opts.calls),
+        ),
+        (
+            "execute, rebuilt, no compiled cache",
+            per_call(
+                lambda: db.execute(
+                    rebuilt(pk),
+                    execution_options={"compiled_cache": None},
+                ).scalar(),
+                opts.calls,
+            ),
+        ),
+        (
+            "execute, rebuilt",
+            per_call(lambda: db.execute(rebuilt(pk)).scalar(), opts.calls),
+        ),
+        (
+            "execute, built once (crud)",
+            per_call(lambda: crud.get_product_by_id(db, pk), opts.calls),
+        ),
+    ]
+
+    # parsing and planning on server, the same for every driver
+    sql = (
+        "SELECT id, name, description, price, stock_quantity, version "
+        "FROM product WHERE id = {} AND deleted_at IS NULL"
+    )
+    db.execute(
+        text("PREPARE bench_product_by_id(int) AS " + sql.format("$1"))
+    )
+    rows += [
+        (
+            "server, parsed and planned per call",
+            per_call(
+                lambda: db.execute(text(sql.format(":id")), {"id": pk}).all(),
+                opts.calls,
+            ),
+        ),
+        (
+            "server, prepared",
+            per_call(
+                lambda: db.execute(
+                    text("EXECUTE bench_product_by_id(:id)"), {"id": pk}
+                ).all(),
+                opts.calls,
+            ),
+        ),
+    ]
+    db.execute(text("DEALLOCATE bench_product_by_id"))
+    db.close()
+
+    print(f"{'':<40} {'us/call':>8}")
+    for name, micros in rows:
+        print(f"{name:<40} {micros:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
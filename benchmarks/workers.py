@@ -0,0 +1,129 @@
+"""
+Throughput of the API served by gunicorn with growing count of workers.
+
+Starts gunicorn (see gunicorn.conf.py) with every given worker count,
+loads it with concurrent keep-alive clients from separate processes and
+prints requests per second and latency percentiles.
+
+Usage (DATABASE_URL should point to prepared database):
+    poetry run python benchmarks/workers.py --workers 1 2 4 8
+
+Run it on a multi-core box, with client processes on other cores than
+workers (or on another host via --url), otherwise load generator and
+server compete for the same CPUs.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_ready(host: str, port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/docs")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server didn't start")
+
+
+def ensure_product(host: str, port: int) -> int:
+    conn = http.client.HTTPConnection(host, port)
+    conn.request(
+        "POST",
+        "/products/",
+        body=b'{"name": "bench", "description": "bench", "price": 1}',
+        headers={"Content-Type": "application/json"},
+    )
+    conn.getresponse().read()
+    conn.request("GET", "/products/?limit=1")
+    return json.loads(conn.getresponse().read())[0]["id"]
+
+
+def client(args: tuple[str, int, str, float]) -> list[float]:
+    host, port, path, duration = args
+    conn = http.client.HTTPConnection(host, port)
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        if response.status == 200:
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run(workers: int, opts: argparse.Namespace) -> tuple[float, float, float]:
+    host, port = opts.host, opts.port
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    env["BIND"] = f"{host}:{port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "gunicorn.conf.py",
+            "--access-logfile",
+            "/dev/null",
+            "warehouse_manager.app:app",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        wait_ready(host, port)
+        path = opts.path.format(product_id=ensure_product(host, port))
+        with multiprocessing.Pool(opts.clients) as pool:
+            results = pool.map(
+                client, [(host, port, path, opts.duration)] * opts.clients
+            )
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    latencies = sorted(lat for result in results for lat in result)
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    return (
+        len(latencies) / opts.duration,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--path", default="/products/{product_id}/")
+    opts = parser.parse_args()
+    url = urlsplit(opts.url)
+    opts.host, opts.port = url.hostname, url.port
+
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers in opts.workers:
+        rps, p50, p99 = run(workers, opts)
+        print(f"{workers:>8} {rps:>10.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Gunicorn config for multi-process production serving.
+
+Run with:
+    gunicorn -c gunicorn.conf.py warehouse_manager.app:app
+
+App is imported once in master process and then forked into
+WEB_CONCURRENCY uvicorn workers. Every worker gets its own database
+connection pool (see warehouse_manager.database) and its own in-memory
+state (catalog snapshot etc.), nothing is shared between workers.
+
+Send HUP to master to gracefully restart workers: new workers are forked
+and old ones finish in-flight requests within graceful_timeout.
+Since app is preloaded, code changes require restart of master
+(or USR2 + TERM of old master for zero downtime upgrade).
+"""
+
+import multiprocessing
+import os
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# defaults to count of CPU cores
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+
+worker_class = "uvicorn.workers.UvicornWorker"
+
+preload_app = True
+
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+
+keepalive = 5
+
+# recycle workers from time to time to bound memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
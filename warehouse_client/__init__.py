@@ -0,0 +1,46 @@
+"""
+Client of warehouse manager API.
+
+    from warehouse_client import AsyncClient
+
+    async with AsyncClient("http://warehouse:8000") as client:
+        products = await asyncio.gather(
+            *(client.get_product(pk) for pk in ids)
+        )  # one multi-get request
+        async for order in client.iter_orders():
+            ...
+"""
+
+from ._http import RetryPolicy
+from .aio import AsyncClient
+from .errors import ApiError, NotFound
+from .models import (
+    Location,
+    Order,
+    OrderCreate,
+    OrderItem,
+    OrderItemCreate,
+    OrderLookup,
+    Product,
+    ProductCreate,
+    ProductLookup,
+)
+from .sync import Client
+
+
+__all__ = [
+    "ApiError",
+    "AsyncClient",
+    "Client",
+    "Location",
+    "NotFound",
+    "Order",
+    "OrderCreate",
+    "OrderItem",
+    "OrderItemCreate",
+    "OrderLookup",
+    "Product",
+    "ProductCreate",
+    "ProductLookup",
+    "RetryPolicy",
+]
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from typing import TypeVar
+
+import httpx
+from pydantic import BaseModel
+
+from .errors import ApiError, NotFound
+
+
+M = TypeVar("M", bound=BaseModel)
+
+# max ids server accepts in one multi-get request (its MAX_LOOKUP_IDS)
+MAX_LOOKUP_IDS = 100
+
+# responses of overloaded server or proxy in front of it
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+@dataclass
+class RetryPolicy:
+    """When and how long to wait before request is sent again"""
+
+    # tries in total, including the first one
+    attempts: int = 3
+
+    # seconds before the first retry, doubled for every next one
+    backoff: float = 0.1
+
+    # upper bound of any delay, including one asked by Retry-After
+    max_delay: float = 5.0
+
+    def delay(
+        self,
+        attempt: int,
+        idempotent: bool,
+        response: httpx.Response | None = None,
+    ) -> float | None:
+        """
+        :param attempt: number of failed try, from 0
+        :param idempotent: whether request may be safely sent twice
+        :param response: response of failed try, None on transport error
+        :return: seconds to wait before next try or None if request
+        shouldn't be retried
+        """
+
+        if attempt + 1 >= self.attempts:
+            return None
+        if response is None:
+            # request may have reached server
+            return self._backoff(attempt) if idempotent else None
+        if response.status_code == 409 and idempotent:
+            # earlier try with the same idempotency key is in progress
+            return self._backoff(attempt)
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if not idempotent and (
+            response.status_code != 503 or retry_after is None
+        ):
+            # only admission rejection guarantees request wasn't handled
+            return None
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_delay)
+        return self._backoff(attempt)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff * 2**attempt, self.max_delay)
+
+
+def limits(max_connections: int) -> httpx.Limits:
+    """:return: pool limits keeping all connections alive between calls"""
+
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+    )
+
+
+def raise_for_status(response: httpx.Response) -> None:
+    """:raise ApiError: if response has error status"""
+
+    if response.is_success:
+        return
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        detail = response.text
+    error = NotFound if response.status_code == 404 else ApiError
+    raise error(response.status_code, detail)
+
+
+def parse(response: httpx.Response, model: type[M]) -> M:
+    raise_for_status(response)
+    return model.model_validate_json(response.content)
+
+
+def parse_list(response: httpx.Response, model: type[M]) -> list[M]:
+    raise_for_status(response)
+    return [model.model_validate(item) for item in response.json()]
+
+
+def chunks(ids: list[int]) -> list[list[int]]:
+    """:return: distinct ids split into multi-get sized chunks"""
+
+    ids = list(dict.fromkeys(ids))
+    return [
+        ids[start:start + MAX_LOOKUP_IDS]
+        for start in range(0, len(ids), MAX_LOOKUP_IDS)
+    ]
+
+
+def merge(lookups: list[M], model: type[M]) -> M:
+    """:return: lookup with items and missing ids of all given ones"""
+
+    return model(
+        items=[item for lookup in lookups for item in lookup.items],
+        missing=[pk for lookup in lookups for pk in lookup.missing],
+    )
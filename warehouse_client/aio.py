@@ -0,0 +1,270 @@
+import asyncio
+import uuid
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from . import _http
+from .errors import NotFound
+from .models import (
+    Order,
+    OrderCreate,
+    OrderLookup,
+    Product,
+    ProductCreate,
+    ProductLookup,
+)
+
+
+class _Batcher:
+    """
+    Collects single-id lookups made within short window and resolves
+    them with one multi-get request. Every caller gets its own item
+    or NotFound.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[list[int]], Awaitable[ProductLookup | OrderLookup]],
+        window: float,
+        max_size: int,
+    ):
+        self.fetch = fetch
+        self.window = window
+        self.max_size = max_size
+        self._pending: dict[int, list[asyncio.Future]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    async def get(self, pk: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(pk, []).append(future)
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        task = asyncio.create_task(self._resolve(pending))
+        # keep reference until done, loop holds tasks weakly
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _resolve(self, pending: dict[int, list[asyncio.Future]]):
+        try:
+            lookup = await self.fetch(list(pending))
+        except Exception as exc:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+
+        found = {item.id: item for item in lookup.items}
+        for pk, futures in pending.items():
+            for future in futures:
+                if future.done():
+                    # caller was cancelled
+                    continue
+                if pk in found:
+                    future.set_result(found[pk])
+                else:
+                    future.set_exception(NotFound(404, f"{pk} not found"))
+
+
+class AsyncClient:
+    """
+    Asyncio client of warehouse manager API.
+
+    Requests share one pool of keep-alive connections and at most
+    max_concurrency of them are in flight at once, the rest wait.
+    Single product and order reads made concurrently (within
+    batch_window) are sent as one multi-get request. Requests are
+    retried on connection errors (if they are safe to repeat) and when
+    server is overloaded.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        *,
+        max_connections: int = 10,
+        max_concurrency: int | None = None,
+        batch_window: float = 0.002,
+        timeout: float = 10.0,
+        retry: _http.RetryPolicy | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """
+        :param base_url: url of API
+        :param max_connections: size of connection pool
+        :param max_concurrency: max count of requests in flight,
+        max_connections by default
+        :param batch_window: seconds single reads wait to be batched,
+        0 batches only reads made in the same loop iteration
+        :param timeout: seconds to wait for connection or response
+        :param retry: retry policy, 3 tries with backoff by default
+        :param transport: transport to use instead of network, e.g.
+        httpx.ASGITransport of in-process app
+        """
+
+        self.retry = retry or _http.RetryPolicy()
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            limits=_http.limits(max_connections),
+            timeout=timeout,
+            transport=transport,
+        )
+        self._slots = asyncio.Semaphore(max_concurrency or max_connections)
+        self._products = _Batcher(
+            self.get_products, batch_window, _http.MAX_LOOKUP_IDS
+        )
+        self._orders = _Batcher(
+            self.get_orders, batch_window, _http.MAX_LOOKUP_IDS
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    # products
+
+    async def get_product(self, product_id: int) -> Product:
+        """
+        Batched with concurrent reads of other products
+        :raise NotFound: if product doesn't exist
+        """
+
+        return await self._products.get(product_id)
+
+    async def get_products(self, product_ids: list[int]) -> ProductLookup:
+        """
+        :return: found products in requested order and ids with no match,
+        resolved with concurrent requests of MAX_LOOKUP_IDS ids
+        """
+
+        lookups = await asyncio.gather(
+            *(
+                self._lookup("/products/lookup/", chunk, ProductLookup)
+                for chunk in _http.chunks(product_ids)
+            )
+        )
+        return _http.merge(list(lookups), ProductLookup)
+
+    def iter_products(self, page_size: int = 100) -> AsyncIterator[Product]:
+        """:return: all products, fetched page by page while iterated"""
+
+        return self._paginate("/products/", Product, page_size)
+
+    async def create_product(self, product: ProductCreate | dict) -> Product:
+        """:raise ApiError: if product with given name exists"""
+
+        body = ProductCreate.model_validate(product).model_dump()
+        return _http.parse(
+            await self._request(
+                "POST", "/products/", json=body, idempotent=False
+            ),
+            Product,
+        )
+
+    # orders
+
+    async def get_order(self, order_id: int) -> Order:
+        """
+        Batched with concurrent reads of other orders
+        :raise NotFound: if order doesn't exist
+        """
+
+        return await self._orders.get(order_id)
+
+    async def get_orders(self, order_ids: list[int]) -> OrderLookup:
+        """
+        :return: found orders in requested order and ids with no match,
+        resolved with concurrent requests of MAX_LOOKUP_IDS ids
+        """
+
+        lookups = await asyncio.gather(
+            *(
+                self._lookup("/orders/lookup/", chunk, OrderLookup)
+                for chunk in _http.chunks(order_ids)
+            )
+        )
+        return _http.merge(list(lookups), OrderLookup)
+
+    def iter_orders(self, page_size: int = 100) -> AsyncIterator[Order]:
+        """:return: all orders, fetched page by page while iterated"""
+
+        return self._paginate("/orders/", Order, page_size)
+
+    async def create_order(
+        self, order: OrderCreate | dict, idempotency_key: str | None = None
+    ) -> Order:
+        """
+        Sent with idempotency key (random by default), so that retries
+        don't create order twice
+        :raise ApiError: if there is not enough products in stock
+        """
+
+        body = OrderCreate.model_validate(order).model_dump(mode="json")
+        headers = {"Idempotency-Key": idempotency_key or str(uuid.uuid4())}
+        return _http.parse(
+            await self._request(
+                "POST", "/orders/", json=body, headers=headers
+            ),
+            Order,
+        )
+
+    async def _lookup(self, path: str, ids: list[int], model: type[_http.M]):
+        # multi-get doesn't change anything, safe to repeat
+        return _http.parse(
+            await self._request("POST", path, json={"ids": ids}), model
+        )
+
+    async def _paginate(
+        self, path: str, model: type[_http.M], page_size: int
+    ) -> AsyncIterator[_http.M]:
+        skip = 0
+        while True:
+            page = _http.parse_list(
+                await self._request(
+                    "GET", path, params={"skip": skip, "limit": page_size}
+                ),
+                model,
+            )
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+            skip += page_size
+
+    async def _request(
+        self, method: str, path: str, idempotent: bool = True, **kwargs
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                async with self._slots:
+                    response = await self._http.request(
+                        method, path, **kwargs
+                    )
+            except httpx.TransportError:
+                delay = self.retry.delay(attempt, idempotent)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry.delay(attempt, idempotent, response)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
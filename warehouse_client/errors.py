@@ -0,0 +1,11 @@
+class ApiError(Exception):
+    """API responded with error status"""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class NotFound(ApiError):
+    """Requested resource doesn't exist"""
@@ -0,0 +1,96 @@
+"""
+Models of API resources, aligned with warehouse_manager.schemas.
+
+Unknown fields of responses are ignored, so client keeps working with
+newer server versions.
+"""
+
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class _Model(BaseModel):
+
+    model_config = ConfigDict(extra="ignore")
+
+
+class ProductCreate(_Model):
+
+    name: str
+
+    description: str
+
+    price: float = Field(gt=0)
+
+    stock_quantity: int = 0
+
+
+class Product(ProductCreate):
+
+    id: int
+
+    version: int
+
+
+class Location(_Model):
+
+    latitude: float = Field(ge=-90, le=90)
+
+    longitude: float = Field(ge=-180, le=180)
+
+
+class OrderItemCreate(_Model):
+
+    product_id: int
+
+    quantity: int
+
+
+class OrderItem(OrderItemCreate):
+
+    id: int
+
+    order_id: int
+
+    warehouse_id: int | None = None
+
+    unit_price: float
+
+
+class OrderCreate(_Model):
+
+    status: str = ""
+
+    items: list[OrderItemCreate]
+
+    ship_to: Location | None = None
+
+
+class Order(_Model):
+
+    id: int
+
+    status: str
+
+    created_at: datetime
+
+    total_price: float
+
+    item_count: int
+
+    items: list[OrderItem]
+
+
+class ProductLookup(_Model):
+
+    items: list[Product]
+
+    missing: list[int]
+
+
+class OrderLookup(_Model):
+
+    items: list[Order]
+
+    missing: list[int]
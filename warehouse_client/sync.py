@@ -0,0 +1,182 @@
+import time
+import uuid
+from typing import Iterator
+
+import httpx
+
+from . import _http
+from .models import (
+    Order,
+    OrderCreate,
+    OrderLookup,
+    Product,
+    ProductCreate,
+    ProductLookup,
+)
+
+
+class Client:
+    """
+    Blocking client of warehouse manager API.
+
+    Requests share one pool of keep-alive connections; calls made from
+    several threads at once wait for free connection, so pool size
+    bounds concurrency. Requests are retried on connection errors
+    (if they are safe to repeat) and when server is overloaded.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        *,
+        max_connections: int = 10,
+        timeout: float = 10.0,
+        retry: _http.RetryPolicy | None = None,
+        http: httpx.Client | None = None,
+    ):
+        """
+        :param base_url: url of API
+        :param max_connections: size of connection pool
+        :param timeout: seconds to wait for connection or response
+        :param retry: retry policy, 3 tries with backoff by default
+        :param http: HTTP client to use instead of own pool
+        """
+
+        self.retry = retry or _http.RetryPolicy()
+        self._owns_http = http is None
+        self._http = http or httpx.Client(
+            base_url=base_url,
+            limits=_http.limits(max_connections),
+            timeout=timeout,
+        )
+
+    def close(self) -> None:
+        if self._owns_http:
+            self._http.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # products
+
+    def get_product(self, product_id: int) -> Product:
+        """:raise NotFound: if product doesn't exist"""
+
+        return _http.parse(
+            self._request("GET", f"/products/{product_id}/"), Product
+        )
+
+    def get_products(self, product_ids: list[int]) -> ProductLookup:
+        """
+        :return: found products in requested order and ids with no match,
+        resolved with one request per MAX_LOOKUP_IDS ids
+        """
+
+        return _http.merge(
+            [
+                self._lookup("/products/lookup/", chunk, ProductLookup)
+                for chunk in _http.chunks(product_ids)
+            ],
+            ProductLookup,
+        )
+
+    def iter_products(self, page_size: int = 100) -> Iterator[Product]:
+        """:return: all products, fetched page by page while iterated"""
+
+        return self._paginate("/products/", Product, page_size)
+
+    def create_product(self, product: ProductCreate | dict) -> Product:
+        """:raise ApiError: if product with given name exists"""
+
+        body = ProductCreate.model_validate(product).model_dump()
+        return _http.parse(
+            self._request("POST", "/products/", json=body, idempotent=False),
+            Product,
+        )
+
+    # orders
+
+    def get_order(self, order_id: int) -> Order:
+        """:raise NotFound: if order doesn't exist"""
+
+        return _http.parse(
+            self._request("GET", f"/orders/{order_id}/"), Order
+        )
+
+    def get_orders(self, order_ids: list[int]) -> OrderLookup:
+        """
+        :return: found orders in requested order and ids with no match,
+        resolved with one request per MAX_LOOKUP_IDS ids
+        """
+
+        return _http.merge(
+            [
+                self._lookup("/orders/lookup/", chunk, OrderLookup)
+                for chunk in _http.chunks(order_ids)
+            ],
+            OrderLookup,
+        )
+
+    def iter_orders(self, page_size: int = 100) -> Iterator[Order]:
+        """:return: all orders, fetched page by page while iterated"""
+
+        return self._paginate("/orders/", Order, page_size)
+
+    def create_order(
+        self, order: OrderCreate | dict, idempotency_key: str | None = None
+    ) -> Order:
+        """
+        Sent with idempotency key (random by default), so that retries
+        don't create order twice
+        :raise ApiError: if there is not enough products in stock
+        """
+
+        body = OrderCreate.model_validate(order).model_dump(mode="json")
+        headers = {"Idempotency-Key": idempotency_key or str(uuid.uuid4())}
+        return _http.parse(
+            self._request("POST", "/orders/", json=body, headers=headers),
+            Order,
+        )
+
+    def _lookup(self, path: str, ids: list[int], model: type[_http.M]):
+        # multi-get doesn't change anything, safe to repeat
+        return _http.parse(
+            self._request("POST", path, json={"ids": ids}), model
+        )
+
+    def _paginate(
+        self, path: str, model: type[_http.M], page_size: int
+    ) -> Iterator[_http.M]:
+        skip = 0
+        while True:
+            page = _http.parse_list(
+                self._request(
+                    "GET", path, params={"skip": skip, "limit": page_size}
+                ),
+                model,
+            )
+            yield from page
+            if len(page) < page_size:
+                return
+            skip += page_size
+
+    def _request(
+        self, method: str, path: str, idempotent: bool = True, **kwargs
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = self._http.request(method, path, **kwargs)
+            except httpx.TransportError:
+                delay = self.retry.delay(attempt, idempotent)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry.delay(attempt, idempotent, response)
+                if delay is None:
+                    return response
+            time.sleep(delay)
+            attempt += 1
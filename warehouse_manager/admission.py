@@ -0,0 +1,269 @@
+import asyncio
+import enum
+import heapq
+import itertools
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .settings import (
+    ADMISSION_QUEUE_FACTOR,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_READ_SHARE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+)
+
+
+class RouteClass(enum.IntEnum):
+    """Classes of routes, lower value is admitted first"""
+
+    order_create = 0
+
+    write = 1
+
+    read = 2
+
+
+@dataclass
+class ClassLimits:
+    """Admission limits of route class"""
+
+    # max count of requests handled at the same time
+    concurrency: int
+
+    # max count of requests waiting for admission
+    queue: int
+
+
+@dataclass
+class ClassStats:
+    """Admission metrics of route class"""
+
+    admitted: int = 0
+
+    queued: int = 0
+
+    rejected: int = 0
+
+    timed_out: int = 0
+
+    in_flight: int = 0
+
+    queue_depth: int = 0
+
+
+class AdmissionController:
+    """
+    Limits count of requests handled at the same time to count of database
+    connections, so that excess requests wait in bounded queue or fail fast
+    instead of piling up in threadpool waiting for connection.
+
+    Waiting requests are admitted by priority of their route class
+    and then in order of arrival.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        class_limits: dict[RouteClass, ClassLimits],
+        queue_timeout: float,
+    ):
+        self.limit = limit
+        self.class_limits = class_limits
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.stats = {route_class: ClassStats() for route_class in RouteClass}
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @classmethod
+    def for_pool(
+        cls,
+        pool_size: int,
+        queue_factor: float,
+        queue_timeout: float,
+        read_share: float,
+    ) -> "AdmissionController":
+        """
+        :param pool_size: max count of database connections of worker
+        :param queue_factor: queue depth relative to pool size
+        :param queue_timeout: max seconds request waits for admission
+        :param read_share: share of connections available to reads
+        :return: controller sized for given connection pool
+        """
+
+        queue = max(1, int(pool_size * queue_factor))
+        return cls(
+            limit=pool_size,
+            class_limits={
+                RouteClass.order_create: ClassLimits(pool_size, queue),
+                RouteClass.write: ClassLimits(pool_size, queue),
+                RouteClass.read: ClassLimits(
+                    max(1, int(pool_size * read_share)), queue
+                ),
+            },
+            queue_timeout=queue_timeout,
+        )
+
+    async def acquire(self, route_class: RouteClass) -> bool:
+        """
+        Wait until request of given class can be handled
+        :param route_class: class of request route
+        :return: True if request is admitted, False if it is rejected
+        because queue is full or wait timed out
+        """
+
+        stats = self.stats[route_class]
+        if self._can_admit(route_class) and not self._waiting_before(
+            route_class
+        ):
+            self._admit(route_class)
+            return True
+
+        if stats.queue_depth >= self.class_limits[route_class].queue:
+            stats.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (route_class, next(self._order), waiter)
+        heapq.heappush(self._waiters, entry)
+        stats.queued += 1
+        stats.queue_depth += 1
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter), timeout=self.queue_timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # admitted right at the deadline
+                return True
+            self._dequeue(entry)
+            stats.timed_out += 1
+            stats.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            # client went away while waiting
+            if waiter.done():
+                self.release(route_class)
+            else:
+                self._dequeue(entry)
+            raise
+
+    def release(self, route_class: RouteClass) -> None:
+        """
+        Free slot taken by admitted request and admit waiting ones
+        :param route_class: class of request route
+        """
+
+        self.in_flight -= 1
+        self.stats[route_class].in_flight -= 1
+        self._wake()
+
+    def _can_admit(self, route_class: RouteClass) -> bool:
+        return (
+            self.in_flight < self.limit
+            and self.stats[route_class].in_flight
+            < self.class_limits[route_class].concurrency
+        )
+
+    def _waiting_before(self, route_class: RouteClass) -> bool:
+        # heap head is the waiter with highest priority
+        return bool(self._waiters) and self._waiters[0][0] <= route_class
+
+    def _dequeue(self, entry: tuple[int, int, asyncio.Future]) -> None:
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self.stats[entry[0]].queue_depth -= 1
+
+    def _admit(self, route_class: RouteClass) -> None:
+        self.in_flight += 1
+        self.stats[route_class].in_flight += 1
+        self.stats[route_class].admitted += 1
+
+    def _wake(self) -> None:
+        skipped = []
+        while self._waiters and self.in_flight < self.limit:
+            entry = heapq.heappop(self._waiters)
+            route_class, _, waiter = entry
+            if not self._can_admit(route_class):
+                # class is at its own limit, let lower classes in
+                skipped.append(entry)
+                continue
+            self.stats[route_class].queue_depth -= 1
+            self._admit(route_class)
+            waiter.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self._waiters, entry)
+
+
+class AdmissionMiddleware:
+    """Admit requests to database bound routes through controller"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        retry_after: int,
+    ):
+        self.app = app
+        self.controller = controller
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        route_class = (
+            classify(scope["method"], scope["path"])
+            if scope["type"] == "http"
+            else None
+        )
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(route_class):
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
+
+    async def _reject(self, send: Send) -> None:
+        body = b'{"detail":"Service is overloaded, retry later"}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def classify(method: str, path: str) -> RouteClass | None:
+    """
+    :param method: request method
+    :param path: request path
+    :return: class of route or None if route doesn't use database
+    """
+
+    if not path.startswith(("/products", "/orders", "/warehouses")):
+        return None
+    if method == "POST" and path.rstrip("/") == "/orders":
+        return RouteClass.order_create
+    if method in ("GET", "HEAD") or path.rstrip("/").endswith("/lookup"):
+        return RouteClass.read
+    return RouteClass.write
+
+
+controller = AdmissionController.for_pool(
+    pool_size=DB_POOL_SIZE + DB_MAX_OVERFLOW,
+    queue_factor=ADMISSION_QUEUE_FACTOR,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    read_share=ADMISSION_READ_SHARE,
+)
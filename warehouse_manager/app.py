@@ -1,9 +1,59 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from . import (
+    admission,
+    background,
+    catalog,
+    crud,
+    idempotency,
+    profiling,
+    slow_queries,
+    stock_ledger,
+    warmup,
+)
+from .database import SessionLocal, engine
+from .settings import (
+    ADMIN_TOKEN,
+    ADMISSION_ENABLED,
+    ADMISSION_RETRY_AFTER,
+    CATALOG_SNAPSHOT_ENABLED,
+    IDEMPOTENCY_ENABLED,
+    IDEMPOTENCY_POLL_INTERVAL,
+    IDEMPOTENCY_WAIT_TIMEOUT,
+    INVENTORY_LEDGER_ENABLED,
+    PRODUCT_PURGE_BATCH,
+    PRODUCT_PURGE_DELAY,
+    PRODUCT_PURGE_ENABLED,
+    PRODUCT_PURGE_INTERVAL,
+    PROFILING_ENABLED,
+    PROFILING_INTERVAL,
+    PROFILING_SAMPLE_RATE,
+    SLOW_QUERY_LOG_ENABLED,
+)
 
 
+logger = logging.getLogger(__name__)
+
 tags_metadata = [
     {"name": "products", "description": "Operations with products."},
     {"name": "orders", "description": "Operations with orders."},
+    {
+        "name": "warehouses",
+        "description": "Warehouses and stock of products in them.",
+    },
+    {
+        "name": "health",
+        "description": "Liveness and readiness probes of worker.",
+    },
+    {
+        "name": "admin",
+        "description": "Diagnostics, require 'X-Admin-Token' header.",
+    },
 ]
 
 description = """
@@ -16,18 +66,84 @@ You can:
 * **Create** product.
 * **Get list** of all or specified count of products.
 * **Get details** of certain product.
-* **Update** product details.
-* **Delete** product.
+* **Get several** products by list of ids in one request.
+* **Get stock** of certain product, current or at given moment
+(with inventory ledger).
+* **Update** product details (whole or partially, with optimistic
+concurrency control through 'ETag' and 'If-Match' headers).
+* **Adjust** stock and price of many products (given by ids or filter)
+at once, with dry run.
+* **Delete** product (it's hidden at once and purged in background).
 
 ## Orders
 
 You can:
 
-* **Create** order.
+* **Create** order, its items are shipped from warehouses nearest
+to delivery location. Prices of products and total price of order
+are fixed when it's created.
 * **Get list** of all or specified count of orders.
 * **Get details** of certain order.
-* **Update** order status.
+* **Get several** orders by list of ids in one request.
+* **Update** order status, of one order or of many orders at once.
+
+Order creation and bulk updates accept 'Idempotency-Key' header,
+duplicates of request get response of the first one.
+
+## Warehouses
+
+You can:
+
+* **Create** warehouse with its location and priority.
+* **Get list** of all warehouses.
+* **Get** and **set** stock of products in warehouse.
 """
+
+
+def _purge_products(db: Session) -> None:
+    deleted, anonymized = crud.purge_deleted_products(
+        db, older_than=PRODUCT_PURGE_DELAY, batch_size=PRODUCT_PURGE_BATCH
+    )
+    if deleted or anonymized:
+        logger.info(
+            "Purged deleted products: %d deleted, %d anonymized",
+            deleted,
+            anonymized,
+        )
+
+
+def _catalog_page(db: Session, skip: int, limit: int) -> list:
+    return crud.get_products(db, skip=skip, limit=limit)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(warmup.state.run, engine, SessionLocal)
+    tasks = []
+    if INVENTORY_LEDGER_ENABLED:
+        tasks.append(stock_ledger.start_compactor(SessionLocal))
+    if PRODUCT_PURGE_ENABLED:
+        purge = background.PeriodicTask(
+            "product-purge",
+            _purge_products,
+            SessionLocal,
+            interval=PRODUCT_PURGE_INTERVAL,
+        )
+        purge.start()
+        tasks.append(purge)
+    if IDEMPOTENCY_ENABLED:
+        tasks.append(idempotency.start_cleanup(SessionLocal))
+    if CATALOG_SNAPSHOT_ENABLED:
+        rebuilder = catalog.snapshot.start_rebuilder(
+            SessionLocal, _catalog_page
+        )
+        if rebuilder is not None:
+            tasks.append(rebuilder)
+    yield
+    for task in tasks:
+        task.stop()
+
+
 app = FastAPI(
     title="Warehouse manager API",
     summary="FastAPI application for managing warehouse "
@@ -38,4 +154,34 @@ app = FastAPI(
         "email": "sergeiroitberg@yandex.ru",
     },
     openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
+
+if PROFILING_ENABLED:
+    app.add_middleware(
+        profiling.ProfilingMiddleware,
+        store=profiling.store,
+        token=ADMIN_TOKEN,
+        sample_rate=PROFILING_SAMPLE_RATE,
+        interval=PROFILING_INTERVAL,
+    )
+
+if SLOW_QUERY_LOG_ENABLED:
+    app.add_middleware(slow_queries.RouteContextMiddleware)
+
+if ADMISSION_ENABLED:
+    app.add_middleware(
+        admission.AdmissionMiddleware,
+        controller=admission.controller,
+        retry_after=ADMISSION_RETRY_AFTER,
+    )
+
+# outside of admission control: duplicates waiting for the first
+# request don't hold its slots
+if IDEMPOTENCY_ENABLED:
+    app.add_middleware(
+        idempotency.IdempotencyMiddleware,
+        store=idempotency.store,
+        wait_timeout=IDEMPOTENCY_WAIT_TIMEOUT,
+        poll_interval=IDEMPOTENCY_POLL_INTERVAL,
+    )
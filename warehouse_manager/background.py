@@ -0,0 +1,40 @@
+import logging
+import threading
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(threading.Thread):
+    """
+    Runs job with its own session every interval seconds in daemon
+    thread, until stopped. Failures are logged, job runs again on the
+    next tick.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        job: Callable[[Session], None],
+        session_factory: Callable[[], Session],
+        interval: float,
+    ):
+        super().__init__(daemon=True, name=name)
+        self.job = job
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.session_factory() as db:
+                    self.job(db)
+            except Exception:
+                logger.exception("Background task %s failed", self.name)
+
+    def stop(self) -> None:
+        self._stopped.set()
@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from . import background, schemas
+from .settings import (
+    CATALOG_SNAPSHOT_MAX_PAGES,
+    CATALOG_SNAPSHOT_REBUILD_INTERVAL,
+    CATALOG_SNAPSHOT_TTL,
+)
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+# pages smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+products_adapter = TypeAdapter(list[schemas.Product])
+
+
+@dataclass
+class CatalogPage:
+    """Serialized catalog page with its precompressed variants"""
+
+    body: bytes
+
+    etag: str
+
+    built_at: float = field(default_factory=time.monotonic)
+
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes) -> "CatalogPage":
+        """
+        :param body: serialized page
+        :return: page with gzip (and brotli if installed) variants
+        """
+
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        page = cls(body=body, etag=f'"{digest}"')
+        if len(body) >= MIN_COMPRESS_SIZE:
+            page.encoded["gzip"] = gzip.compress(body, compresslevel=9)
+            if brotli is not None:
+                page.encoded["br"] = brotli.compress(body, quality=9)
+        return page
+
+    def negotiate(self, accept_encoding: str | None) -> tuple[bytes, str]:
+        """
+        :param accept_encoding: value of Accept-Encoding request header
+        :return: best matching body and its content encoding
+        ('identity' if none of precompressed variants is accepted)
+        """
+
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.encoded and encoding in accepted:
+                return self.encoded[encoding], encoding
+        return self.body, "identity"
+
+
+class CatalogSnapshot:
+    """
+    In-memory cache of serialized product catalog pages.
+
+    Pages are keyed by (skip, limit) and dropped on every product change
+    (see invalidate). Each worker process keeps its own snapshot, so changes
+    made through other workers become visible after the TTL at the latest.
+    Dropped pages are rebuilt by background rebuilder (see start_rebuilder)
+    every rebuild interval, once for all changes made within it.
+    """
+
+    def __init__(self, max_pages: int, ttl: float, rebuild_interval: float):
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self.rebuild_interval = rebuild_interval
+        self.generation = 0
+        self._pages: OrderedDict[tuple[int, int], CatalogPage] = (
+            OrderedDict()
+        )
+        # keys of dropped pages, waiting for rebuilder
+        self._stale: set[tuple[int, int]] = set()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def get(
+        self,
+        skip: int,
+        limit: int,
+        fetch: Callable[[int, int], list],
+    ) -> CatalogPage:
+        """
+        :param skip: count of products to skip (from beginning)
+        :param limit: max count of products in page
+        :param fetch: function loading products of page from the database
+        :return: cached page, built with fetch if missing or expired
+        """
+
+        key = (skip, limit)
+        page = self._lookup(key)
+        if page is not None:
+            return page
+
+        # only one thread builds pages, the rest reuse its result
+        with self._build_lock:
+            page = self._lookup(key)
+            if page is None:
+                page = self._build(key, fetch)
+        return page
+
+    def invalidate(self) -> None:
+        """Drop all pages after products change, they are rebuilt later"""
+
+        with self._lock:
+            self.generation += 1
+            self._stale.update(self._pages)
+            self._pages.clear()
+
+    def rebuild_stale(self, fetch: Callable[[int, int], list]) -> int:
+        """
+        Rebuild pages dropped since last rebuild ahead of the next read
+        :param fetch: function loading products of page from the database
+        :return: count of rebuilt pages
+        """
+
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        for skip, limit in stale:
+            self.get(skip, limit, fetch)
+        return len(stale)
+
+    def start_rebuilder(
+        self,
+        session_factory: Callable[[], Session],
+        fetch: Callable[[Session, int, int], list],
+    ) -> background.PeriodicTask | None:
+        """
+        :param session_factory: factory of sessions rebuilder uses
+        :param fetch: function loading products of page with given session
+        :return: started periodic rebuild of dropped pages or None
+        if rebuilding is disabled (pages are built by the next read)
+        """
+
+        if not self.rebuild_interval:
+            return None
+
+        def rebuild(db: Session) -> None:
+            self.rebuild_stale(partial(fetch, db))
+
+        rebuilder = background.PeriodicTask(
+            "catalog-rebuilder",
+            rebuild,
+            session_factory,
+            interval=self.rebuild_interval,
+        )
+        rebuilder.start()
+        return rebuilder
+
+    def _lookup(self, key: tuple[int, int]) -> CatalogPage | None:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                return None
+            if time.monotonic() - page.built_at > self.ttl:
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return page
+
+    def _build(
+        self, key: tuple[int, int], fetch: Callable[[int, int], list]
+    ) -> CatalogPage:
+        generation = self.generation
+        products = products_adapter.validate_python(
+            fetch(*key), from_attributes=True
+        )
+        page = CatalogPage.build(products_adapter.dump_json(products))
+
+        with self._lock:
+            # products changed while page was being built, don't cache it
+            if generation == self.generation:
+                self._pages[key] = page
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+        return page
+
+
+def _parse_accept_encoding(header: str | None) -> set[str]:
+    """
+    :param header: value of Accept-Encoding request header
+    :return: accepted encodings (with non-zero quality)
+    """
+
+    accepted = set()
+    for part in (header or "").split(","):
+        encoding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00"):
+            continue
+        if encoding:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+snapshot = CatalogSnapshot(
+    max_pages=CATALOG_SNAPSHOT_MAX_PAGES,
+    ttl=CATALOG_SNAPSHOT_TTL,
+    rebuild_interval=CATALOG_SNAPSHOT_REBUILD_INTERVAL,
+)
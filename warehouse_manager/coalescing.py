@@ -0,0 +1,103 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from .settings import COALESCING_ENABLED, COALESCING_MAX_KEYS
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class CoalescingStats:
+    """Single-flight metrics"""
+
+    # calls made
+    requests: int = 0
+
+    # calls which did the work
+    leaders: int = 0
+
+    # calls which reused result of leader
+    followers: int = 0
+
+    # calls which did the work because key table was full
+    bypassed: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Share of calls served by result of another call"""
+
+        return self.followers / self.requests if self.requests else 0.0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: only the first one
+    (leader) does the work, the rest wait for its result or exception.
+
+    Count of keys in flight is bounded, calls over the bound are not
+    coalesced.
+    """
+
+    def __init__(self, max_keys: int, enabled: bool = True):
+        self.max_keys = max_keys
+        self.enabled = enabled
+        self.stats = CoalescingStats()
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Count of distinct keys in flight"""
+
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: key of call, calls with equal keys share result
+        :param fn: function doing the work
+        :return: result of fn called by this or concurrent call
+        """
+
+        if not self.enabled:
+            return await fn()
+
+        self.stats.requests += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self.stats.followers += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # leader was cancelled (its client went away), try again
+            self.stats.followers -= 1
+            self.stats.requests -= 1
+            return await self.do(key, fn)
+
+        if len(self._calls) >= self.max_keys:
+            self.stats.bypassed += 1
+            return await fn()
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.stats.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # mark exception as retrieved if nobody waits for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+reads = SingleFlight(max_keys=COALESCING_MAX_KEYS, enabled=COALESCING_ENABLED)
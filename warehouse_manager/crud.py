@@ -1,44 +1,131 @@
+from datetime import timedelta
+from decimal import Decimal
 from typing import Any
 
-from sqlalchemy.orm import Session
-from sqlalchemy import select, ScalarResult
-
-from . import models, schemas
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    and_,
+    delete,
+    func,
+    literal,
+    select,
+    update,
+    ScalarResult,
+    any_,
+    bindparam,
+)
+
+from . import inventory, models, schemas, stock_ledger
+from .database import id_array
 
 
 # products section
+
+# products which aren't soft-deleted, matches partial indexes of product
+_live = models.Product.deleted_at.is_(None)
+
+# statements of hot lookups are built once: cache key of statement object
+# is memoized, so their calls skip building and hashing the construct
+# and get compiled SQL straight from the cache
+_product_by_id = select(models.Product).where(
+    models.Product.id == bindparam("product_id"), _live
+)
+_product_quantity = select(models.Product.stock_quantity).where(
+    models.Product.id == bindparam("product_id"), _live
+)
+
+# with inventory ledger, stock of product is its stock quantity (snapshot)
+# plus this sum of movements appended since compaction
+_pending_stock = (
+    select(func.coalesce(func.sum(models.StockMovement.delta), 0))
+    .where(models.StockMovement.product_id == models.Product.id)
+    .correlate(models.Product)
+    .scalar_subquery()
+)
+# loaded values replace ones already in session, which are adjusted
+_product_with_pending_by_id = _product_by_id.add_columns(
+    _pending_stock
+).execution_options(populate_existing=True)
+
+
+def _current_stock(rows) -> list[models.Product]:
+    """
+    :param rows: rows of product and its pending ledger movements
+    :return: products with current stock quantity (not to be flushed)
+    """
+
+    products = []
+    for product, pending in rows:
+        set_committed_value(
+            product, "stock_quantity", product.stock_quantity + pending
+        )
+        products.append(product)
+    return products
+
+
+def _select_products(db: Session, stmt: Select) -> list[models.Product]:
+    """
+    :param db: session object
+    :param stmt: select of products
+    :return: selected products, with current stock quantity
+    if inventory ledger is enabled
+    """
+
+    if not stock_ledger.ledger.enabled:
+        return list(db.execute(stmt).scalars())
+    stmt = stmt.add_columns(_pending_stock).execution_options(
+        populate_existing=True
+    )
+    return _current_stock(db.execute(stmt))
+
+
 def create_product(
     db: Session, product: schemas.ProductCreate
-) -> schemas.Product:
+) -> schemas.Product | None:
     """
-    Create product with given credentials
+    Create product with single INSERT ... ON CONFLICT DO NOTHING statement
     :param db: session object
     :param product: product containing at least name, description, price,
     and stock quantity
-    :return: created product
+    :return: created product or None if product with given name exists
     """
 
-    db_product = models.Product(**product.model_dump())
-
-    db.add(db_product)
+    stmt = (
+        insert(models.Product)
+        .values(**product.model_dump())
+        .on_conflict_do_nothing(
+            index_elements=[models.Product.name], index_where=_live
+        )
+        .returning(models.Product)
+    )
+    db_product = db.execute(stmt).scalar_one_or_none()
     db.commit()
-    db.refresh(db_product)
 
     return db_product
 
 
 def get_products(
     db: Session, skip: int = 0, limit: int = 100
-) -> ScalarResult[Any]:
+) -> list[schemas.Product]:
     """
     :param db: session object
     :param skip: count of products to skip (from beginning)
     :param limit: max count of products to be shown
-    :return: scalar result with retrieved products
+    :return: retrieved products
     """
 
-    stmt = select(models.Product).offset(skip).limit(limit)
-    return db.execute(stmt).scalars()
+    stmt = (
+        select(models.Product)
+        .where(_live)
+        .order_by(models.Product.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return _select_products(db, stmt)
 
 
 def get_product_by_id(db: Session, product_id: int) -> schemas.Product | None:
@@ -48,9 +135,28 @@ def get_product_by_id(db: Session, product_id: int) -> schemas.Product | None:
     :return: product with given id or None if there's no match
     """
 
-    stmt = select(models.Product).where(models.Product.id == product_id)
-    result = db.execute(statement=stmt).scalar()
-    return result
+    params = {"product_id": product_id}
+    if not stock_ledger.ledger.enabled:
+        return db.execute(_product_by_id, params).scalar()
+    products = _current_stock(db.execute(_product_with_pending_by_id, params))
+    return products[0] if products else None
+
+
+def get_products_by_ids(
+    db: Session, product_ids: list[int]
+) -> list[schemas.Product]:
+    """
+    Resolve several products with a single query
+    :param db: session object
+    :param product_ids: product ids
+    :return: found products ordered as in product_ids
+    """
+
+    stmt = select(models.Product).where(
+        models.Product.id == any_(id_array(product_ids)), _live
+    )
+    found = {product.id: product for product in _select_products(db, stmt)}
+    return [found[pk] for pk in product_ids if pk in found]
 
 
 def get_product_by_name(db: Session, name: str) -> schemas.Product | None:
@@ -60,7 +166,7 @@ def get_product_by_name(db: Session, name: str) -> schemas.Product | None:
     :return: product with given name or None if there's no match
     """
 
-    stmt = select(models.Product).where(models.Product.name == name)
+    stmt = select(models.Product).where(models.Product.name == name, _live)
     result = db.execute(statement=stmt).scalar()
     return result
 
@@ -73,100 +179,265 @@ def get_product_quantity(db: Session, product_id: int) -> int | None:
     or None if product not found
     """
 
-    stmt = select(models.Product.stock_quantity).where(
-        models.Product.id == product_id
-    )
-    return db.execute(stmt).scalar_one_or_none()
+    if stock_ledger.ledger.enabled:
+        return stock_ledger.ledger.current(db, [product_id]).get(product_id)
+    return db.execute(
+        _product_quantity, {"product_id": product_id}
+    ).scalar_one_or_none()
 
 
-def reduce_product_quantity(
-    db: Session, product_id: int, r_value: int
+def update_product(
+    db: Session,
+    product_id: int,
+    update_data: schemas.ProductUpdate | schemas.ProductPatch,
+    expected_version: int | None = None,
 ) -> schemas.Product | None:
     """
+    Update product with single conditional UPDATE ... RETURNING statement
     :param db: session object
     :param product_id: product id
-    :param r_value:
-    :return: product if stock quantity reducing passed successfully
-    or None if there is not enough products in stock
+    :param update_data: new product data including fields:
+    name, description, price, stock_quantity (of patch only fields
+    which are set are updated)
+    :param expected_version: update product only if its version still
+    equals given one
+    :return: updated product or None if product not found
+    or its version doesn't match expected one
     """
-    product_stock_quantity = get_product_quantity(db, product_id)
 
-    if not product_stock_quantity:
-        return None
+    if isinstance(update_data, schemas.ProductPatch):
+        values = update_data.model_dump(exclude_unset=True, exclude_none=True)
+    else:
+        values = update_data.model_dump()
+    # with inventory ledger stock is changed by appending movement
+    stock_quantity = (
+        values.pop("stock_quantity", None)
+        if stock_ledger.ledger.enabled
+        else None
+    )
 
-    if r_value > product_stock_quantity:
+    stmt = (
+        update(models.Product)
+        .where(models.Product.id == product_id, _live)
+        .values(**values, version=models.Product.version + 1)
+        .returning(models.Product)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(models.Product.version == expected_version)
+    if not stock_ledger.ledger.enabled:
+        db_product = db.execute(stmt).scalar_one_or_none()
+        db.commit()
+        return db_product
+
+    updated = _current_stock(
+        db.execute(
+            stmt.returning(_pending_stock).execution_options(
+                populate_existing=True
+            )
+        )
+    )
+    if not updated:
+        db.commit()
         return None
+    db_product = updated[0]
+    if stock_quantity is not None:
+        stock_ledger.ledger.adjust(db, product_id, stock_quantity)
+        set_committed_value(db_product, "stock_quantity", stock_quantity)
+    db.commit()
 
-    db_product = get_product_by_id(db, product_id)
-    db_product.stock_quantity -= r_value
+    return db_product
 
-    stmt = select(models.Product).where(models.Product.id == product_id)
 
-    db.execute(stmt).scalar_one()
+def delete_product(db: Session, product_id: int) -> None | bool:
+    """
+    Soft delete product with single UPDATE statement, it's hidden from
+    reads at once and purged later in background
+    :param db: session object
+    :param product_id: product id
+    :return: delete product with given id if presented
+    """
 
+    stmt = (
+        update(models.Product)
+        .where(models.Product.id == product_id, _live)
+        .values(deleted_at=func.now(), version=models.Product.version + 1)
+        .returning(models.Product.id)
+    )
+    deleted = db.execute(stmt).scalar_one_or_none()
     db.commit()
 
-    db.refresh(db_product)
+    return True if deleted is not None else None
 
-    return db_product
 
-
-def update_product(
-    db: Session, product_id: int, update_data: schemas.ProductUpdate
-) -> schemas.Product | None:
+def purge_deleted_products(
+    db: Session, older_than: float, batch_size: int
+) -> tuple[int, int]:
     """
+    Purge products soft-deleted more than given seconds ago in batches,
+    each batch in its own short transaction. Products without orders are
+    deleted, products referenced by orders are anonymized to keep
+    order history.
     :param db: session object
-    :param product_id: product id
-    :param update_data: new product data including fields:
-    name, description, price, stock_quantity
-    :return: updated product
+    :param older_than: seconds since soft delete
+    :param batch_size: max count of products purged in one transaction
+    :return: counts of deleted and anonymized products
     """
 
-    db_product = get_product_by_id(db, product_id)
-    if not db_product:
-        return None
-    db_product.name = update_data.name
-    db_product.description = update_data.description
-    db_product.price = update_data.price
-    db_product.stock_quantity = update_data.stock_quantity
+    deleted = anonymized = 0
+    while True:
+        ids = (
+            db.execute(
+                select(models.Product.id)
+                .where(
+                    models.Product.deleted_at
+                    < func.clock_timestamp() - timedelta(seconds=older_than),
+                    models.Product.purged_at.is_(None),
+                )
+                .order_by(models.Product.id)
+                .limit(batch_size)
+                # concurrent purges take different batches
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            db.rollback()
+            break
 
-    db_product = db.execute(
-        select(models.Product).where(models.Product.id == product_id)
-    ).scalar()
+        has_orders = (
+            select(models.OrderItem.id)
+            .where(models.OrderItem.product_id == models.Product.id)
+            .exists()
+        )
+        deleted += len(
+            db.execute(
+                delete(models.Product)
+                .where(models.Product.id == any_(id_array(ids)), ~has_orders)
+                .returning(models.Product.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+        )
+        anonymized += len(
+            db.execute(
+                update(models.Product)
+                .where(models.Product.id == any_(id_array(ids)))
+                .values(
+                    name=func.concat("deleted-", models.Product.id),
+                    description="",
+                    stock_quantity=0,
+                    purged_at=func.now(),
+                )
+                .returning(models.Product.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+        )
+        db.commit()
 
-    db.commit()
-    db.refresh(db_product)
+        if len(ids) < batch_size:
+            break
 
-    return db_product
+    return deleted, anonymized
 
 
-def delete_product(db: Session, product_id: int) -> None | bool:
+def adjust_products(
+    db: Session, adjust: schemas.ProductBulkAdjust, chunk_size: int
+) -> schemas.ProductBulkResult:
     """
+    Set or increment stock and set or change by percentage price of
+    products given by ids or filter. Products are updated in chunks,
+    each with single UPDATE ... RETURNING statement in its own
+    transaction; dry run counts them with one query.
     :param db: session object
-    :param product_id: product id
-    :return: delete product with given id if presented
+    :param adjust: selection of products and their adjustments
+    :param chunk_size: max count of products updated by one statement
+    :return: count of adjusted products, ids of skipped
+    and missing products
     """
 
-    db_product = get_product_by_id(db, product_id)
-    if not db_product:
-        return None
+    values: dict[str, Any] = {"version": models.Product.version + 1}
+    allowed = [_live]
+    if adjust.stock is not None:
+        if adjust.stock.set is not None:
+            values["stock_quantity"] = adjust.stock.set
+        else:
+            stock = models.Product.stock_quantity + adjust.stock.increment
+            values["stock_quantity"] = stock
+            allowed.append(stock >= 0)
+    if adjust.price is not None:
+        if adjust.price.set is not None:
+            values["price"] = adjust.price.set
+        else:
+            factor = Decimal(1) + Decimal(str(adjust.price.percent)) / 100
+            price = func.round(models.Product.price * factor, 2)
+            values["price"] = price
+            allowed.append(price > 0)
+
+    conditions = [_live]
+    product_filter = adjust.filter
+    if product_filter is not None:
+        if product_filter.name is not None:
+            conditions.append(
+                models.Product.name.icontains(product_filter.name)
+            )
+        if product_filter.price_from is not None:
+            conditions.append(
+                models.Product.price >= product_filter.price_from
+            )
+        if product_filter.price_to is not None:
+            conditions.append(models.Product.price < product_filter.price_to)
+        if product_filter.stock_from is not None:
+            conditions.append(
+                models.Product.stock_quantity >= product_filter.stock_from
+            )
+        if product_filter.stock_to is not None:
+            conditions.append(
+                models.Product.stock_quantity < product_filter.stock_to
+            )
+
+    if adjust.dry_run:
+        stmt = select(models.Product.id, and_(*allowed)).where(*conditions)
+        if adjust.ids is not None:
+            stmt = stmt.where(models.Product.id == any_(id_array(adjust.ids)))
+        rows = db.execute(stmt.order_by(models.Product.id)).all()
+        found = {pk for pk, _ in rows}
+        return schemas.ProductBulkResult(
+            affected=sum(1 for _, changed in rows if changed),
+            skipped=[pk for pk, changed in rows if not changed],
+            missing=[
+                pk for pk in dict.fromkeys(adjust.ids or []) if pk not in found
+            ],
+            dry_run=True,
+        )
 
-    db.delete(db_product)
+    updated, skipped, missing = _bulk_update(
+        db,
+        models.Product,
+        values,
+        and_(*allowed),
+        chunk_size,
+        ids=adjust.ids,
+        conditions=conditions,
+    )
+    return schemas.ProductBulkResult(
+        affected=len(updated), skipped=skipped, missing=missing, dry_run=False
+    )
 
-    db.execute(
-        select(models.Product).where(models.Product.id == product_id)
-    ).first()
 
-    db.commit()
+# orders section
 
-    return True
+# built once, see _product_by_id
+_order_by_id = select(models.Order).where(
+    models.Order.id == bindparam("order_id")
+)
 
 
-# orders section
 def create_order(
     db: Session, order: schemas.OrderCreate
 ) -> schemas.Order | None:
     """
+    Create order, allocate its items to warehouses and take them from
+    stock in one transaction
     :param db: session object
     :param order: order containing order items
     :return: created order or None if there is not enough products
@@ -176,17 +447,20 @@ def create_order(
     else:
         db_order = models.Order()
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()
 
-    if not create_order_items(db, db_order.id, order.items):
-        db.delete(db_order)
-        db.execute(
-            select(models.Order).where(models.Order.id == db_order.id)
-        ).first()
-        db.commit()
+    db_items = create_order_items(db, db_order.id, order.items, order.ship_to)
+    if not db_items:
+        db.rollback()
         return None
 
+    db.commit()
+    # items and totals are known, don't load them back
+    set_committed_value(db_order, "items", db_items)
+    total_price, item_count = _order_totals(db_items)
+    set_committed_value(db_order, "total_price", total_price)
+    set_committed_value(db_order, "item_count", item_count)
+
     return db_order
 
 
@@ -197,10 +471,16 @@ def get_orders(
     :param db: session object
     :param skip: count of orders to skip (from beginning)
     :param limit: max count of orders to be shown
-    :return: scalar result with retrieved orders
+    :return: scalar result with retrieved orders, ordered by id,
+    so that pages are stable
     """
 
-    stmt = select(models.Order).offset(skip).limit(limit)
+    stmt = (
+        select(models.Order)
+        .order_by(models.Order.id)
+        .offset(skip)
+        .limit(limit)
+    )
     return db.execute(stmt).scalars()
 
 
@@ -211,61 +491,355 @@ def get_order_by_id(db: Session, order_id: int) -> schemas.Order | None:
     :return: order with given id or None if there's no match
     """
 
-    stmt = select(models.Order).where(models.Order.id == order_id)
-    result = db.execute(statement=stmt).scalar()
-    return result
+    return db.execute(_order_by_id, {"order_id": order_id}).scalar()
+
+
+def get_orders_by_ids(
+    db: Session, order_ids: list[int]
+) -> list[schemas.Order]:
+    """
+    Resolve several orders (with their items) with a single query
+    :param db: session object
+    :param order_ids: order ids
+    :return: found orders ordered as in order_ids
+    """
+
+    stmt = (
+        select(models.Order)
+        .where(models.Order.id == any_(id_array(order_ids)))
+        .options(selectinload(models.Order.items))
+    )
+    found = {order.id: order for order in db.execute(stmt).scalars()}
+    return [found[pk] for pk in order_ids if pk in found]
 
 
 def update_order_status(
     db: Session, order_id: int, status: str
 ) -> schemas.Order | None:
     """
+    Update order status with UPDATE ... RETURNING statement,
+    items are loaded with one more query
     :param db: session object
     :param order_id: order id
     :param status: new order status
     :return: updated order or none if order not exists
     """
-    db_order = get_order_by_id(db, order_id)
-    if not db_order:
-        return None
 
-    db_order.status = status
+    stmt = (
+        update(models.Order)
+        .where(models.Order.id == order_id)
+        # enum member, so that already loaded order is updated with it
+        .values(status=models.OrderStatusEnum[status])
+        .returning(models.Order)
+        .options(selectinload(models.Order.items))
+    )
+    db_order = db.execute(stmt).scalar_one_or_none()
+    db.commit()
+
+    return db_order
+
 
-    db_order = db.execute(
-        select(models.Order).where(models.Order.id == order_id)
-    ).scalar_one()
+def update_orders_status(
+    db: Session,
+    status: str,
+    chunk_size: int,
+    order_ids: list[int] | None = None,
+    order_filter: schemas.OrderFilter | None = None,
+) -> schemas.OrderStatusBulkResult:
+    """
+    Move orders given by ids or filter to new status, if it's allowed
+    from their current status. Orders are updated in chunks, each with
+    single UPDATE ... RETURNING statement in its own transaction.
+    :param db: session object
+    :param status: name of new status
+    :param chunk_size: max count of orders updated by one statement
+    :param order_ids: ids of orders
+    :param order_filter: filter orders are selected by, if ids aren't given
+    :return: ids of updated, skipped and missing orders
+    """
 
+    new_status = models.OrderStatusEnum[status]
+    allowed = [
+        previous
+        for previous, following in models.ORDER_STATUS_TRANSITIONS.items()
+        if new_status in following
+    ]
+
+    conditions = []
+    if order_filter is not None:
+        if order_filter.status is not None:
+            conditions.append(
+                models.Order.status
+                == models.OrderStatusEnum[order_filter.status]
+            )
+        if order_filter.created_from is not None:
+            conditions.append(
+                models.Order.created_at >= order_filter.created_from
+            )
+        if order_filter.created_to is not None:
+            conditions.append(
+                models.Order.created_at < order_filter.created_to
+            )
+
+    updated, skipped, missing = _bulk_update(
+        db,
+        models.Order,
+        {"status": new_status},
+        models.Order.status.in_(allowed),
+        chunk_size,
+        ids=order_ids,
+        conditions=conditions,
+    )
+    return schemas.OrderStatusBulkResult(
+        updated=updated, skipped=skipped, missing=missing
+    )
+
+
+def _bulk_update(
+    db: Session,
+    model: type[models.Product] | type[models.Order],
+    values: dict[str, Any],
+    allowed: ColumnElement[bool],
+    chunk_size: int,
+    ids: list[int] | None = None,
+    conditions: list[ColumnElement[bool]] | None = None,
+) -> tuple[list[int], list[int], list[int]]:
+    """
+    Update rows given by ids or conditions in chunks, each chunk with
+    single statement in its own transaction
+    :param model: model of updated rows
+    :param values: new values of columns
+    :param allowed: condition of rows which may be updated, others
+    are skipped
+    :param chunk_size: max count of rows updated by one statement
+    :param ids: ids of rows
+    :param conditions: conditions rows are selected by, if ids aren't given
+    :return: ids of updated, skipped and missing rows
+    """
+
+    updated, skipped = [], []
+    if ids is not None:
+        ids = list(dict.fromkeys(ids))
+        for start in range(0, len(ids), chunk_size):
+            target = select(model.id).where(
+                model.id == any_(id_array(ids[start:start + chunk_size])),
+                *(conditions or []),
+            )
+            for pk, changed in _update_locked(
+                db, model, target, values, allowed
+            ):
+                (updated if changed else skipped).append(pk)
+        found = set(updated) | set(skipped)
+        return updated, skipped, [pk for pk in ids if pk not in found]
+
+    # keyset pagination, chunks don't depend on changes made by previous
+    last_id = 0
+    while True:
+        target = (
+            select(model.id)
+            .where(*(conditions or []), model.id > last_id)
+            .order_by(model.id)
+            .limit(chunk_size)
+        )
+        rows = _update_locked(db, model, target, values, allowed)
+        for pk, changed in rows:
+            (updated if changed else skipped).append(pk)
+        if len(rows) < chunk_size:
+            return updated, skipped, []
+        last_id = rows[-1][0]
+
+
+def _update_locked(
+    db: Session,
+    model: type[models.Product] | type[models.Order],
+    target: Select,
+    values: dict[str, Any],
+    allowed: ColumnElement[bool],
+) -> list[tuple[int, bool]]:
+    """
+    Lock target rows and update allowed ones with one statement, commit
+    :param target: select of ids of target rows
+    :return: id of every target row, ordered, and whether it was updated
+    """
+
+    locked = target.with_for_update().cte("target")
+    changed = (
+        update(model)
+        .where(model.id == locked.c.id, allowed)
+        .values(**values)
+        .returning(model.id)
+        .cte("changed")
+    )
+    rows = db.execute(
+        select(locked.c.id, changed.c.id.is_not(None))
+        .select_from(locked.outerjoin(changed, changed.c.id == locked.c.id))
+        .order_by(locked.c.id)
+    ).all()
     db.commit()
-    db.refresh(db_order)
 
-    return db_order
+    return [(pk, is_changed) for pk, is_changed in rows]
 
 
 def create_order_items(
-    db: Session, order_id: int, items: list[schemas.OrderItemCreate]
-) -> list[schemas.OrderItemCreate] | None:
+    db: Session,
+    order_id: int,
+    items: list[schemas.OrderItemCreate],
+    ship_to: schemas.Location | None = None,
+) -> list[models.OrderItem] | None:
     """
+    Allocate order items and insert them with prices of products,
+    totals of order are written by the same statement.
+    Changes are not committed
     :param db: session object
     :param order_id: order id
     :param items: order items
+    :param ship_to: delivery location, used to pick nearest warehouses
     :return: return list of created order items
     or None if they weren't created cause of lack in stock
     """
-    db_items = []
-    for item in items:
-        if not reduce_product_quantity(db, item.product_id, item.quantity):
-            db.rollback()
-            return None
+    allocations = inventory.allocate(db, items, ship_to, order_id=order_id)
+    if allocations is None:
+        return None
 
-        db_item = models.OrderItem(
-            order_id=order_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
+    total_price, item_count = _order_totals(allocations)
+    totals = (
+        update(models.Order)
+        .where(models.Order.id == order_id)
+        .values(total_price=total_price, item_count=item_count)
+        .returning(models.Order.id)
+        .cte("totals")
+    )
+    stmt = (
+        insert(models.OrderItem)
+        .values(
+            [
+                {
+                    "order_id": order_id,
+                    "product_id": allocation.product_id,
+                    "warehouse_id": allocation.warehouse_id,
+                    "quantity": allocation.quantity,
+                    "unit_price": allocation.unit_price,
+                }
+                for allocation in allocations
+            ]
         )
-        db_items.append(db_item)
+        .returning(models.OrderItem)
+        .add_cte(totals)
+    )
+
+    return list(db.execute(stmt).scalars())
 
-    db.add_all(db_items)
 
+def _order_totals(
+    items: list[inventory.Allocation] | list[models.OrderItem],
+) -> tuple[Decimal, int]:
+    """:return: total price and total quantity of items"""
+
+    return (
+        sum(item.unit_price * item.quantity for item in items),
+        sum(item.quantity for item in items),
+    )
+
+
+# warehouses section
+def create_warehouse(
+    db: Session, warehouse: schemas.WarehouseCreate
+) -> schemas.Warehouse | None:
+    """
+    Create warehouse with single INSERT ... ON CONFLICT DO NOTHING statement
+    :param db: session object
+    :param warehouse: warehouse data
+    :return: created warehouse or None if warehouse with given name exists
+    """
+
+    stmt = (
+        insert(models.Warehouse)
+        .values(**warehouse.model_dump())
+        .on_conflict_do_nothing(index_elements=[models.Warehouse.name])
+        .returning(models.Warehouse)
+    )
+    db_warehouse = db.execute(stmt).scalar_one_or_none()
+    db.commit()
+
+    return db_warehouse
+
+
+def get_warehouses(db: Session) -> ScalarResult[Any]:
+    """
+    :param db: session object
+    :return: scalar result with all warehouses
+    """
+
+    stmt = select(models.Warehouse).order_by(models.Warehouse.id)
+    return db.execute(stmt).scalars()
+
+
+def get_warehouse_by_id(
+    db: Session, warehouse_id: int
+) -> schemas.Warehouse | None:
+    """
+    :param db: session object
+    :param warehouse_id: warehouse id
+    :return: warehouse with given id or None if there's no match
+    """
+
+    return db.get(models.Warehouse, warehouse_id)
+
+
+def get_warehouse_stock(
+    db: Session, warehouse_id: int
+) -> ScalarResult[Any]:
+    """
+    :param db: session object
+    :param warehouse_id: warehouse id
+    :return: scalar result with stock of products in warehouse
+    """
+
+    stmt = (
+        select(models.WarehouseStock)
+        .where(models.WarehouseStock.warehouse_id == warehouse_id)
+        .order_by(models.WarehouseStock.product_id)
+    )
+    return db.execute(stmt).scalars()
+
+
+def set_warehouse_stock(
+    db: Session, warehouse_id: int, stock: schemas.WarehouseStockSet
+) -> schemas.WarehouseStock:
+    """
+    Set stock with single INSERT ... ON CONFLICT DO UPDATE statement
+    :param db: session object
+    :param warehouse_id: warehouse id
+    :param stock: product and its quantity in warehouse
+    :return: stock of product in warehouse or None if warehouse
+    or product doesn't exist
+    """
+
+    found = select(
+        literal(warehouse_id),
+        literal(stock.product_id),
+        literal(stock.quantity),
+    ).where(
+        select(models.Warehouse.id)
+        .where(models.Warehouse.id == warehouse_id)
+        .exists(),
+        select(models.Product.id)
+        .where(models.Product.id == stock.product_id, _live)
+        .exists(),
+    )
+    stmt = (
+        insert(models.WarehouseStock)
+        .from_select(["warehouse_id", "product_id", "quantity"], found)
+        .on_conflict_do_update(
+            index_elements=[
+                models.WarehouseStock.warehouse_id,
+                models.WarehouseStock.product_id,
+            ],
+            set_={"quantity": stock.quantity},
+        )
+        .returning(models.WarehouseStock)
+    )
+    db_stock = db.execute(stmt).scalar_one_or_none()
     db.commit()
 
-    return db_items
+    return db_stock
@@ -1,10 +1,78 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import Integer, bindparam, create_engine
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from .settings import DATABASE_URL
+from . import slow_queries
+from .settings import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_PREPARE_THRESHOLD,
+    SLOW_QUERY_LOG_ENABLED,
+)
+
+
+def connect_args(url: str) -> dict:
+    """
+    :param url: database url
+    :return: driver arguments of connections: psycopg 3 prepares
+    statements executed often enough server-side, so postgres skips
+    parsing and planning them (psycopg2 can't prepare statements)
+    """
+
+    if make_url(url).get_driver_name() != "psycopg":
+        return {}
+    return {
+        "prepare_threshold": (
+            int(DB_PREPARE_THRESHOLD) if DB_PREPARE_THRESHOLD else None
+        )
+    }
 
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    connect_args=connect_args(DATABASE_URL),
+)
+# objects stay loaded after commit: they are serialized right after it,
+# and reloading each of them would cost another round trip
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 Base = declarative_base()
+
+
+def id_array(ids: list[int], name: str = "ids"):
+    """
+    :param ids: list of ids (or other integers)
+    :param name: name of bind parameter, distinct for each array
+    of a statement
+    :return: bind parameter sending ids as one postgres array,
+    for use with '= ANY(...)' or unnest()
+    """
+
+    return bindparam(name, list(ids), type_=ARRAY(Integer))
+
+
+if SLOW_QUERY_LOG_ENABLED:
+    slow_queries.log.install(engine)
+
+
+def _reset_pool_after_fork():
+    """
+    Give forked worker process its own connection pool.
+
+    Connections opened by the parent (e.g. while app is preloaded before
+    workers are forked) share sockets with it and must not be reused,
+    so they are dropped without closing and new pool is created.
+    """
+
+    engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
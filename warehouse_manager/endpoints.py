@@ -1,12 +1,51 @@
-from fastapi import Depends, HTTPException
+import hmac
+from datetime import datetime
+from functools import partial
+from http import HTTPStatus
+from typing import Callable, Hashable, TypeVar
+
+from fastapi import (
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from pydantic import TypeAdapter
+from sqlalchemy import literal, select
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from . import crud, models, schemas
+from . import (
+    admission,
+    catalog,
+    coalescing,
+    crud,
+    models,
+    profiling,
+    schemas,
+    slow_queries,
+    stock_ledger,
+    warmup,
+)
 from .database import SessionLocal, engine
 from .app import app
+from .settings import (
+    ADMIN_TOKEN,
+    BULK_CHUNK_SIZE,
+    CATALOG_SNAPSHOT_ENABLED,
+    MAX_LOOKUP_IDS,
+)
 
 models.Base.metadata.create_all(bind=engine)
 
+T = TypeVar("T")
+
+orders_adapter = TypeAdapter(list[schemas.Order])
+
 
 # Dependency
 def get_db():
@@ -21,9 +60,73 @@ def get_db():
         db.close()
 
 
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """
+    Allow request only if it has valid 'X-Admin-Token' header
+    :param x_admin_token: value of 'X-Admin-Token' header
+    """
+
+    if not ADMIN_TOKEN or not hmac.compare_digest(
+        (x_admin_token or "").encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+
+def _fetch_catalog_page(db: Session):
+    def fetch(skip: int, limit: int) -> list[models.Product]:
+        return crud.get_products(db, skip=skip, limit=limit)
+
+    return fetch
+
+
+def invalidate_catalog() -> None:
+    """
+    Drop cached catalog pages after products change, background
+    rebuilder builds them again
+    """
+
+    catalog.snapshot.invalidate()
+
+
+def _catalog_response(request: Request, page: catalog.CatalogPage):
+    headers = {
+        "ETag": page.etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if page.etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+    body, encoding = page.negotiate(request.headers.get("accept-encoding"))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def coalesced(key: Hashable, load: Callable[[], T]) -> T:
+    """
+    Run load in threadpool once for all concurrent requests with equal key
+    :param key: key identifying read (route and its params)
+    :param load: function reading from database and serializing result
+    :return: result of load, shared by concurrent requests
+    """
+
+    return await coalescing.reads.do(key, partial(run_in_threadpool, load))
+
+
+def _json_response(body: bytes, headers: dict[str, str] | None = None):
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _missing_header(missing: list[int]) -> dict[str, str]:
+    return {"X-Missing-Ids": ",".join(map(str, missing))} if missing else {}
+
+
 @app.post("/products/", response_model=schemas.Product, tags=["products"])
 def create_product(
-    product: schemas.ProductCreate, db: Session = Depends(get_db)
+    product: schemas.ProductCreate,
+    db: Session = Depends(get_db),
 ):
     """
     Create product with given credentials.
@@ -38,17 +141,22 @@ def create_product(
     if product with given name already exists.
     """
 
-    db_product = crud.get_product_by_name(db, name=product.name)
-    if db_product:
+    db_product = crud.create_product(db, product)
+    if not db_product:
         raise HTTPException(
             status_code=400, detail="Product with given name already existed"
         )
-    return crud.create_product(db, product)
+    invalidate_catalog()
+    return db_product
 
 
 @app.get("/products/", response_model=list[schemas.Product], tags=["products"])
-def read_products(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+async def read_products(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    ids: list[int] | None = Query(default=None, max_length=MAX_LOOKUP_IDS),
+    db: Session = Depends(get_db),
 ):
     """
     Retrieve list of products with given params.
@@ -56,13 +164,128 @@ def read_products(
     **params:**
     - **skip:** (int) n products to skip from beginning. default=0
     - **limit:** (int) max quantity of products to be shown. default=100
+    - **ids:** (int, repeatable) resolve only products with given ids,
+    'skip' and 'limit' are ignored then
 
     **return** By default list of first 100 products, you can manage this
-    behaviour specifying 'skip' and 'limit' params.
+    behaviour specifying 'skip' and 'limit' params. When 'ids' are given,
+    found products are returned in requested order and ids with no match
+    are listed in 'X-Missing-Ids' header.
+
+    Pages without 'ids' are served from the in-memory catalog snapshot,
+    compressed according to 'Accept-Encoding' and tagged with 'ETag'
+    ('If-None-Match' gives 304 if page didn't change).
+
+    Identical concurrent requests share one database read.
+    """
+
+    if ids:
+
+        def load_lookup() -> tuple[bytes, list[int]]:
+            lookup = _lookup_products(db, ids)
+            body = _dump_list(catalog.products_adapter, lookup.items)
+            return body, lookup.missing
+
+        body, missing = await coalesced(
+            ("products", tuple(ids)), load_lookup
+        )
+        return _json_response(body, _missing_header(missing))
+
+    if CATALOG_SNAPSHOT_ENABLED:
+        fetch = _fetch_catalog_page(db)
+        page = await coalesced(
+            ("catalog", skip, limit),
+            partial(catalog.snapshot.get, skip, limit, fetch),
+        )
+        return _catalog_response(request, page)
+
+    def load_page() -> bytes:
+        products = crud.get_products(db, skip=skip, limit=limit)
+        return _dump_list(catalog.products_adapter, products)
+
+    return _json_response(
+        await coalesced(("products", skip, limit), load_page)
+    )
+
+
+@app.post(
+    "/products/lookup/",
+    response_model=schemas.ProductLookup,
+    tags=["products"],
+)
+def lookup_products(
+    lookup: schemas.LookupRequest, db: Session = Depends(get_db)
+):
     """
+    Resolve several products at once.
+
+    **request body:**
+    - **ids** (list[int]) product ids
+
+    **return:** Found products in requested order and list of
+    ids with no match.
+    """
+
+    return _lookup_products(db, lookup.ids)
+
 
-    products = crud.get_products(db, skip=skip, limit=limit)
-    return products
+def _dump_list(adapter: TypeAdapter, items) -> bytes:
+    return adapter.dump_json(
+        adapter.validate_python(items, from_attributes=True)
+    )
+
+
+def _lookup_products(db: Session, ids: list[int]) -> schemas.ProductLookup:
+    ids = list(dict.fromkeys(ids))
+    products = crud.get_products_by_ids(db, ids)
+    found = {product.id for product in products}
+    return schemas.ProductLookup(
+        items=products, missing=[pk for pk in ids if pk not in found]
+    )
+
+
+@app.post(
+    "/products/adjust/",
+    response_model=schemas.ProductBulkResult,
+    tags=["products"],
+)
+def adjust_products(
+    adjust: schemas.ProductBulkAdjust,
+    db: Session = Depends(get_db),
+):
+    """
+    Adjust stock and price of several products at once.
+
+    **request body:**
+    - **ids** (list[int]) product ids, or
+    - **filter** {name (str), price_from (float), price_to (float),
+    stock_from (int), stock_to (int)} products matching all given
+    conditions
+    - **stock** {set (int) or increment (int)} new stock quantity
+    or change of it
+    - **price** {set (float) or percent (float)} new price
+    or its change in percents
+    - **dry_run** (bool) only count products which would be adjusted
+
+    Products whose stock quantity would become negative or price
+    would drop to zero are skipped. Products are adjusted in chunks,
+    each committed separately.
+
+    **return:** Count of adjusted products, ids of skipped products
+    and requested ids with no match, or raise 400 http exception
+    if stock is adjusted while inventory ledger is enabled.
+    """
+
+    if adjust.stock is not None and stock_ledger.ledger.enabled:
+        raise HTTPException(
+            status_code=400,
+            detail="Bulk stock adjustment is not available "
+            "with inventory ledger enabled",
+        )
+    result = crud.adjust_products(db, adjust, chunk_size=BULK_CHUNK_SIZE)
+    if result.affected and not result.dry_run:
+        invalidate_catalog()
+    return result
 
 
 @app.get(
@@ -70,21 +293,74 @@ def read_products(
     response_model=schemas.Product,
     tags=["products"],
 )
-def read_product(product_id: int, db: Session = Depends(get_db)):
+async def read_product(product_id: int, db: Session = Depends(get_db)):
     """
     Retrieve product details.
 
     **params:**
     - **product_id:** (int) product id
 
-    **return:** The details of product by given id, or raise 404 http exception
+    **return:** The details of product by given id with its version
+    in 'ETag' header, or raise 404 http exception
     if product with given id doesn't exist.
+
+    Identical concurrent requests share one database read.
     """
 
-    db_product = crud.get_product_by_id(db, product_id=product_id)
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return db_product
+    def load() -> tuple[bytes, str]:
+        db_product = crud.get_product_by_id(db, product_id=product_id)
+        if not db_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        product = schemas.Product.model_validate(db_product)
+        return product.model_dump_json().encode(), _product_etag(product)
+
+    body, etag = await coalesced(("product", product_id), load)
+    return _json_response(body, {"ETag": etag})
+
+
+@app.get(
+    "/products/{product_id}/stock/",
+    response_model=schemas.StockLevel,
+    tags=["products"],
+)
+def read_product_stock(
+    product_id: int,
+    at: datetime | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve stock quantity of product, current or at given moment.
+
+    **params:**
+    - **product_id:** (int) product id
+    - **at:** (datetime, optional) point in time, requires inventory ledger
+
+    With inventory ledger enabled stock is exact at any moment within
+    ledger retention, before it stock is taken from the nearest older
+    snapshot and marked as not exact.
+
+    **return:** Stock quantity of product, or raise 404 http exception
+    if product doesn't exist or there is no stock history that old.
+    """
+
+    ledger = stock_ledger.ledger
+    if at is None:
+        quantity = ledger.current(db, [product_id]).get(product_id)
+        if quantity is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return stock_ledger.StockLevel(product_id, quantity, exact=True)
+
+    if not ledger.enabled:
+        raise HTTPException(
+            status_code=400,
+            detail="Stock history requires inventory ledger to be enabled",
+        )
+    level = ledger.at(db, product_id, at)
+    if level is None:
+        raise HTTPException(
+            status_code=404, detail="Stock of product at given time not found"
+        )
+    return level
 
 
 @app.put(
@@ -95,6 +371,8 @@ def read_product(product_id: int, db: Session = Depends(get_db)):
 def update_product(
     product_id: int,
     update_data: schemas.ProductUpdate,
+    response: Response,
+    if_match: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ):
     """
@@ -103,6 +381,10 @@ def update_product(
     **params:**
     - **product_id:** product id (int)
 
+    **headers:**
+    - **If-Match:** (optional) product 'ETag', update only if product
+    wasn't changed since it was read
+
     **request body:**
     - **name** (str, unique),
     - **description** (str),
@@ -110,35 +392,127 @@ def update_product(
     - **stock_quantity** (int)
 
     **return:** Updated product or raise 404 http exception
-    if product with given id not found.
+    if product with given id not found, or 412 http exception
+    if product was changed since version given in 'If-Match'.
+    """
+
+    return _update_product(db, product_id, update_data, if_match, response)
+
+
+@app.patch(
+    "/products/{product_id}/",
+    response_model=schemas.Product,
+    tags=["products"],
+)
+def patch_product(
+    product_id: int,
+    update_data: schemas.ProductPatch,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    """
+    Update only given fields of product.
+
+    **params:**
+    - **product_id:** product id (int)
+
+    **headers:**
+    - **If-Match:** (optional) product 'ETag', update only if product
+    wasn't changed since it was read
+
+    **request body (all fields are optional):**
+    - **name** (str, unique),
+    - **description** (str),
+    - **price** (int | number),
+    - **stock_quantity** (int)
+
+    **return:** Updated product or raise 400 http exception if no fields
+    are given, 404 http exception if product with given id not found,
+    or 412 http exception if product was changed since version given
+    in 'If-Match'.
     """
 
-    db_product = crud.update_product(db, product_id, update_data)
+    if not update_data.model_dump(exclude_unset=True, exclude_none=True):
+        raise HTTPException(status_code=400, detail="No fields to update")
+    return _update_product(db, product_id, update_data, if_match, response)
+
+
+def _product_etag(product: models.Product | schemas.Product) -> str:
+    return f'"{product.version}"'
+
+
+def _parse_if_match(if_match: str | None) -> int | None:
+    """
+    :param if_match: value of If-Match header
+    :return: expected product version or None if any version matches
+    """
+
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=412, detail="Product was modified, reload it"
+        )
+
+
+def _update_product(
+    db: Session,
+    product_id: int,
+    update_data: schemas.ProductUpdate | schemas.ProductPatch,
+    if_match: str | None,
+    response: Response,
+):
+    db_product = crud.update_product(
+        db, product_id, update_data, _parse_if_match(if_match)
+    )
     if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
+        # find out why nothing was updated, only on failure
+        current = crud.get_product_by_id(db, product_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(
+            status_code=412,
+            detail="Product was modified, reload it",
+            headers={"ETag": _product_etag(current)},
+        )
+    invalidate_catalog()
+    response.headers["ETag"] = _product_etag(db_product)
     return db_product
 
 
 @app.delete("/products/{product_id}/", tags=["products"])
-def delete_product(product_id: int, db: Session = Depends(get_db)):
+def delete_product(
+    product_id: int,
+    db: Session = Depends(get_db),
+):
     """
     Delete product with given id.
 
     **params:**
     - **product_id:** product id (int)
 
+    Product is hidden from all reads at once and purged in background:
+    deleted if it has no orders, anonymized otherwise.
+
     **return:** Success message or raise 404 http exception
     if product not found.
     """
 
     if not crud.delete_product(db=db, product_id=product_id):
         raise HTTPException(status_code=404, detail="Product not found")
+    invalidate_catalog()
 
     return {"message": "Product successfully deleted"}
 
 
-@app.post("/orders/", response_model=schemas.OrderCreate, tags=["orders"])
-def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
+@app.post("/orders/", response_model=schemas.Order, tags=["orders"])
+def create_order(
+    order: schemas.OrderCreate,
+    db: Session = Depends(get_db),
+):
     """
     Create order with given credentials.
 
@@ -148,6 +522,12 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
                 {product_id (int),
                 quantity (int)}
                 ]
+    - **ship_to:** delivery location {latitude (float), longitude (float)},
+    optional
+
+    Items are shipped from warehouses chosen by allocation strategy,
+    nearest to delivery location by default. Products without
+    per-warehouse stock are taken from their global stock quantity.
 
     **return:** Created order or raise 400 http exception
     if order items are empty or if it's not enough of products in stock.
@@ -161,12 +541,17 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=400, detail="There are not enough items in stock"
         )
+    # stock quantities of ordered products changed
+    invalidate_catalog()
     return db_order
 
 
 @app.get("/orders/", response_model=list[schemas.Order], tags=["orders"])
-def read_orders(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+async def read_orders(
+    skip: int = 0,
+    limit: int = 100,
+    ids: list[int] | None = Query(default=None, max_length=MAX_LOOKUP_IDS),
+    db: Session = Depends(get_db),
 ):
     """
     Retrieve list of orders with given params.
@@ -174,17 +559,98 @@ def read_orders(
     **params:**
     - **skip:** (int) n orders to skip from beginning. default=0
     - **limit:** (int) max orders of products to be shown. default=100
+    - **ids:** (int, repeatable) resolve only orders with given ids,
+    'skip' and 'limit' are ignored then
 
-    **return** By default list of first 100 orders, you can manage this
-    behaviour specifying 'skip' and 'limit' params.
+    **return** By default list of first 100 orders (ordered by id), you
+    can manage this behaviour specifying 'skip' and 'limit' params.
+    When 'ids' are given, found orders are returned in requested order
+    and ids with no match are listed in 'X-Missing-Ids' header.
+
+    Identical concurrent requests share one database read.
     """
 
-    orders = crud.get_orders(db, skip=skip, limit=limit)
-    return orders
+    if ids:
+
+        def load_lookup() -> tuple[bytes, list[int]]:
+            lookup = _lookup_orders(db, ids)
+            return _dump_list(orders_adapter, lookup.items), lookup.missing
+
+        body, missing = await coalesced(("orders", tuple(ids)), load_lookup)
+        return _json_response(body, _missing_header(missing))
+
+    def load_page() -> bytes:
+        orders = crud.get_orders(db, skip=skip, limit=limit)
+        return _dump_list(orders_adapter, orders)
+
+    return _json_response(await coalesced(("orders", skip, limit), load_page))
+
+
+@app.post(
+    "/orders/lookup/", response_model=schemas.OrderLookup, tags=["orders"]
+)
+def lookup_orders(
+    lookup: schemas.LookupRequest, db: Session = Depends(get_db)
+):
+    """
+    Resolve several orders at once.
+
+    **request body:**
+    - **ids** (list[int]) order ids
+
+    **return:** Found orders in requested order and list of
+    ids with no match.
+    """
+
+    return _lookup_orders(db, lookup.ids)
+
+
+def _lookup_orders(db: Session, ids: list[int]) -> schemas.OrderLookup:
+    ids = list(dict.fromkeys(ids))
+    orders = crud.get_orders_by_ids(db, ids)
+    found = {order.id for order in orders}
+    return schemas.OrderLookup(
+        items=orders, missing=[pk for pk in ids if pk not in found]
+    )
+
+
+@app.post(
+    "/orders/status/",
+    response_model=schemas.OrderStatusBulkResult,
+    tags=["orders"],
+)
+def update_orders_status(
+    update: schemas.OrderStatusBulkUpdate, db: Session = Depends(get_db)
+):
+    """
+    Update status of several orders at once.
+
+    **request body:**
+    - **status** (str) new status: processed, in_progress, sent
+    or delivered
+    - **ids** (list[int]) order ids, or
+    - **filter** {status (str), created_from (datetime),
+    created_to (datetime)} orders matching all given conditions
+
+    Orders only move forward (processed, in_progress, sent, delivered),
+    others are skipped. Orders are updated in chunks, each committed
+    separately.
+
+    **return:** Ids of updated and skipped orders and requested ids
+    with no match.
+    """
+
+    return crud.update_orders_status(
+        db,
+        update.status,
+        chunk_size=BULK_CHUNK_SIZE,
+        order_ids=update.ids,
+        order_filter=update.filter,
+    )
 
 
 @app.get("/orders/{order_id}/", response_model=schemas.Order, tags=["orders"])
-def read_order(order_id: int, db: Session = Depends(get_db)):
+async def read_order(order_id: int, db: Session = Depends(get_db)):
     """
     Retrieve order details.
 
@@ -193,11 +659,18 @@ def read_order(order_id: int, db: Session = Depends(get_db)):
 
     **return:** The details of order by given id, or raise 404 http exception
     if order with given id doesn't exist.
+
+    Identical concurrent requests share one database read.
     """
-    db_order = crud.get_order_by_id(db, order_id=order_id)
-    if not db_order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    return db_order
+
+    def load() -> bytes:
+        db_order = crud.get_order_by_id(db, order_id=order_id)
+        if not db_order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        order = schemas.Order.model_validate(db_order)
+        return order.model_dump_json().encode()
+
+    return _json_response(await coalesced(("order", order_id), load))
 
 
 @app.patch(
@@ -221,3 +694,276 @@ def update_order_status(
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
     return db_order
+
+
+@app.post(
+    "/warehouses/", response_model=schemas.Warehouse, tags=["warehouses"]
+)
+def create_warehouse(
+    warehouse: schemas.WarehouseCreate, db: Session = Depends(get_db)
+):
+    """
+    Create warehouse.
+
+    **request body:**
+    - **name** (str, unique),
+    - **latitude** (float, optional),
+    - **longitude** (float, optional),
+    - **priority** (int) lower is preferred when warehouses are
+    equally suitable. default=0
+
+    **return:** Created warehouse, or raise 400 http exception
+    if warehouse with given name already exists.
+    """
+
+    db_warehouse = crud.create_warehouse(db, warehouse)
+    if not db_warehouse:
+        raise HTTPException(
+            status_code=400, detail="Warehouse with given name already existed"
+        )
+    return db_warehouse
+
+
+@app.get(
+    "/warehouses/",
+    response_model=list[schemas.Warehouse],
+    tags=["warehouses"],
+)
+def read_warehouses(db: Session = Depends(get_db)):
+    """
+    Retrieve list of warehouses.
+
+    **return:** All warehouses.
+    """
+
+    return crud.get_warehouses(db)
+
+
+@app.get(
+    "/warehouses/{warehouse_id}/stock/",
+    response_model=list[schemas.WarehouseStock],
+    tags=["warehouses"],
+)
+def read_warehouse_stock(warehouse_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieve stock of products in warehouse.
+
+    **params:**
+    - **warehouse_id:** (int) warehouse id
+
+    **return:** Products with their quantities in warehouse, or raise 404
+    http exception if warehouse with given id doesn't exist.
+    """
+
+    if not crud.get_warehouse_by_id(db, warehouse_id):
+        raise HTTPException(status_code=404, detail="Warehouse not found")
+    return crud.get_warehouse_stock(db, warehouse_id)
+
+
+@app.put(
+    "/warehouses/{warehouse_id}/stock/",
+    response_model=schemas.WarehouseStock,
+    tags=["warehouses"],
+)
+def set_warehouse_stock(
+    warehouse_id: int,
+    stock: schemas.WarehouseStockSet,
+    db: Session = Depends(get_db),
+):
+    """
+    Set quantity of product in warehouse.
+
+    **params:**
+    - **warehouse_id:** (int) warehouse id
+
+    **request body:**
+    - **product_id** (int),
+    - **quantity** (int)
+
+    Once product has stock in any warehouse, its orders are allocated
+    to warehouses instead of its global stock quantity.
+
+    **return:** Stock of product in warehouse, or raise 404 http exception
+    if warehouse or product with given id doesn't exist.
+    """
+
+    db_stock = crud.set_warehouse_stock(db, warehouse_id, stock)
+    if not db_stock:
+        # find out what is missing, only on failure
+        if not crud.get_warehouse_by_id(db, warehouse_id):
+            raise HTTPException(status_code=404, detail="Warehouse not found")
+        raise HTTPException(status_code=404, detail="Product not found")
+    return db_stock
+
+
+@app.get("/health/live", response_model=schemas.Health, tags=["health"])
+async def health_live():
+    """
+    Liveness probe: worker process runs and serves requests.
+
+    **return:** Status 'alive', database isn't checked.
+    """
+
+    return schemas.Health(status="alive")
+
+
+@app.get("/health/ready", response_model=schemas.Health, tags=["health"])
+def health_ready(db: Session = Depends(get_db)):
+    """
+    Readiness probe: worker is warmed up and database is reachable.
+
+    Warm-up which failed on startup is retried by this probe.
+
+    **return:** Status 'ready' with duration of warm-up, or raise 503
+    http exception if worker isn't ready to get traffic.
+    """
+
+    state = warmup.state
+    if not state.ready and not state.run(engine, SessionLocal):
+        raise HTTPException(status_code=503, detail="Warm-up failed")
+    try:
+        db.execute(select(literal(1)))
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="Database unreachable")
+    return schemas.Health(
+        status="ready",
+        warmup_ms=state.duration * 1000 if state.duration else None,
+    )
+
+
+@app.get(
+    "/admin/profiles/",
+    response_model=list[schemas.ProfileInfo],
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+def read_profiles():
+    """
+    Retrieve list of saved request profiles.
+
+    Request is profiled if it is sent with 'X-Profile' header containing
+    admin token, or if it is picked with 'PROFILING_SAMPLE_RATE'
+    (profiling should be enabled with 'PROFILING_ENABLED').
+
+    **return:** Profiles, most recent first.
+    """
+
+    return profiling.store.list()
+
+
+@app.get(
+    "/admin/profiles/{name}",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+def read_profile(name: str):
+    """
+    Download saved request profile.
+
+    **params:**
+    - **name:** (str) profile name
+
+    **return:** Profile in collapsed stack format, ready for flamegraph.pl
+    or speedscope, or raise 404 http exception if profile doesn't exist.
+    """
+
+    path = profiling.store.path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+
+@app.get(
+    "/admin/slow-queries/",
+    response_model=list[schemas.SlowQuery],
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+def read_slow_queries():
+    """
+    Retrieve recent statements slower than 'SLOW_QUERY_THRESHOLD_MS'.
+
+    **return:** Slow queries with redacted parameters, originating route
+    and crud function, most recent first.
+    """
+
+    return slow_queries.log.records()
+
+
+@app.get(
+    "/admin/metrics/admission/",
+    response_model=schemas.AdmissionStats,
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+def read_admission_metrics():
+    """
+    Retrieve admission control metrics of current worker.
+
+    **return:** Limits, in-flight requests, queue depth and counters of
+    admitted, queued and rejected requests for every route class.
+    """
+
+    controller = admission.controller
+    return schemas.AdmissionStats(
+        limit=controller.limit,
+        in_flight=controller.in_flight,
+        classes={
+            route_class.name: schemas.AdmissionClassStats(
+                concurrency_limit=limits.concurrency,
+                queue_limit=limits.queue,
+                **vars(controller.stats[route_class]),
+            )
+            for route_class, limits in controller.class_limits.items()
+        },
+    )
+
+
+@app.get(
+    "/admin/metrics/coalescing/",
+    response_model=schemas.CoalescingStats,
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+def read_coalescing_metrics():
+    """
+    Retrieve read coalescing metrics of current worker.
+
+    **return:** Count of coalesced reads, leaders which queried the database
+    and followers which reused their results.
+    """
+
+    stats = coalescing.reads.stats
+    return schemas.CoalescingStats(
+        **vars(stats), ratio=stats.ratio, in_flight=coalescing.reads.in_flight
+    )
+
+
+@app.post(
+    "/admin/inventory/compact/",
+    response_model=schemas.CompactionResult,
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+def compact_inventory(
+    retention: float | None = Query(default=None, ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Fold inventory ledger movements into product stock quantities now.
+
+    **params:**
+    - **retention:** (float, optional) seconds movements are kept,
+    ledger retention by default. 0 folds all movements, do it before
+    disabling the ledger.
+
+    **return:** Count of compacted products, or raise 409 http exception
+    if compaction is already running.
+    """
+
+    compacted = stock_ledger.ledger.compact(db, retention)
+    if compacted is None:
+        raise HTTPException(
+            status_code=409, detail="Compaction is already running"
+        )
+    return schemas.CompactionResult(products=compacted)
@@ -0,0 +1,417 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import background, models
+from .database import SessionLocal
+from .settings import (
+    IDEMPOTENCY_CLEANUP_INTERVAL,
+    IDEMPOTENCY_LOCK_TIMEOUT,
+    IDEMPOTENCY_TTL,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# routes whose requests are deduplicated by Idempotency-Key header
+ROUTES = frozenset(
+    {
+        ("POST", "/orders"),
+        ("POST", "/orders/status"),
+        ("POST", "/products/adjust"),
+    }
+)
+
+MAX_KEY_LENGTH = 255
+
+
+@dataclass
+class Outcome:
+    """Stored state of request with idempotency key"""
+
+    fingerprint: str
+
+    # None while request is being handled
+    status_code: int | None
+
+    body: bytes | None
+
+    headers: list[tuple[bytes, bytes]] | None
+
+
+class IdempotencyStore:
+    """
+    Keeps outcomes of requests in database, so that retries and
+    duplicates sent to any worker get the response of the first
+    request instead of handling it again.
+
+    The first request claims the key for lock timeout, duplicates see
+    it in progress until response is stored. Keys of failed requests
+    (5xx) are released, so that retry handles request again. Keys of
+    requests ended without response (cancelled, client disconnected)
+    are held until lock timeout, their changes may be committed.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        ttl: float,
+        lock_timeout: float,
+    ):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    def claim(self, key: str, fingerprint: str) -> Outcome | None:
+        """
+        Claim key for handling request, with one statement if it's free
+        :param key: idempotency key
+        :param fingerprint: hash of request
+        :return: None if key is claimed by caller, otherwise outcome
+        of request which holds the key
+        """
+
+        table = models.IdempotencyKey
+        now = func.clock_timestamp()
+        stmt = (
+            insert(table)
+            .values(
+                key=key,
+                fingerprint=fingerprint,
+                locked_until=now + timedelta(seconds=self.lock_timeout),
+                expires_at=now + timedelta(seconds=self.ttl),
+            )
+            .on_conflict_do_update(
+                index_elements=[table.key],
+                set_={
+                    "fingerprint": fingerprint,
+                    "status_code": None,
+                    "body": None,
+                    "headers": None,
+                    "locked_until": now
+                    + timedelta(seconds=self.lock_timeout),
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                },
+                # handler of request died or its outcome expired
+                where=or_(
+                    and_(
+                        table.status_code.is_(None),
+                        table.locked_until < now,
+                    ),
+                    table.expires_at < now,
+                ),
+            )
+            .returning(table.key)
+        )
+        with self.session_factory() as db:
+            claimed = db.execute(stmt).scalar()
+            db.commit()
+            if claimed is not None:
+                return None
+            row = db.execute(
+                select(
+                    table.fingerprint,
+                    table.status_code,
+                    table.body,
+                    table.headers,
+                ).where(table.key == key)
+            ).one_or_none()
+        if row is None:
+            # released in between, report it as in progress to try again
+            return Outcome(fingerprint, None, None, None)
+        headers = row.headers
+        if headers is not None:
+            headers = [
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+        return Outcome(row.fingerprint, row.status_code, row.body, headers)
+
+    def complete(
+        self,
+        key: str,
+        status_code: int,
+        body: bytes,
+        headers: list[tuple[bytes, bytes]],
+    ) -> None:
+        """Store response of request holding the key"""
+
+        with self.session_factory() as db:
+            db.execute(
+                update(models.IdempotencyKey)
+                .where(models.IdempotencyKey.key == key)
+                .values(
+                    status_code=status_code,
+                    body=body,
+                    headers=[
+                        [name.decode("latin-1"), value.decode("latin-1")]
+                        for name, value in headers
+                    ],
+                    locked_until=None,
+                )
+            )
+            db.commit()
+
+    def release(self, key: str) -> None:
+        """Free key of request which failed"""
+
+        with self.session_factory() as db:
+            db.execute(
+                delete(models.IdempotencyKey).where(
+                    models.IdempotencyKey.key == key,
+                    models.IdempotencyKey.status_code.is_(None),
+                )
+            )
+            db.commit()
+
+
+def purge_expired(db: Session) -> int:
+    """
+    :param db: session object
+    :return: count of removed expired keys
+    """
+
+    result = db.execute(
+        delete(models.IdempotencyKey).where(
+            models.IdempotencyKey.expires_at < func.clock_timestamp()
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def start_cleanup(
+    session_factory: Callable[[], Session]
+) -> background.PeriodicTask:
+    """
+    :param session_factory: factory of sessions cleanup uses
+    :return: started periodic removal of expired keys
+    """
+
+    cleanup = background.PeriodicTask(
+        "idempotency-cleanup",
+        purge_expired,
+        session_factory,
+        interval=IDEMPOTENCY_CLEANUP_INTERVAL,
+    )
+    cleanup.start()
+    return cleanup
+
+
+class IdempotencyMiddleware:
+    """
+    Handle write requests with Idempotency-Key header at most once:
+    replays get stored response (marked with Idempotent-Replayed
+    header), concurrent duplicates wait for the first request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: IdempotencyStore,
+        wait_timeout: float,
+        poll_interval: float,
+    ):
+        self.app = app
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        # requests holding keys in this worker, duplicates await them
+        self._handling: dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        key = _idempotency_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_json(
+                send, 400, b'{"detail":"Idempotency-Key is too long"}'
+            )
+            return
+
+        body = await _read_body(receive)
+        digest = hashlib.sha256()
+        for part in (scope["method"], scope["path"], scope["query_string"]):
+            digest.update(part if isinstance(part, bytes) else part.encode())
+            digest.update(b"\0")
+        digest.update(body)
+        fingerprint = digest.hexdigest()
+
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            outcome = await run_in_threadpool(
+                self.store.claim, key, fingerprint
+            )
+            if outcome is None:
+                await self._handle(key, scope, body, send)
+                return
+            if outcome.fingerprint != fingerprint:
+                await _send_json(
+                    send,
+                    422,
+                    b'{"detail":"Idempotency-Key is already used '
+                    b'by another request"}',
+                )
+                return
+            if outcome.status_code is not None:
+                await _send_response(
+                    send,
+                    outcome.status_code,
+                    outcome.body,
+                    [*outcome.headers, (b"idempotent-replayed", b"true")],
+                )
+                return
+            if not await self._wait(key, deadline):
+                await _send_json(
+                    send,
+                    409,
+                    b'{"detail":"Request with this Idempotency-Key '
+                    b'is in progress"}',
+                    [(b"retry-after", b"1")],
+                )
+                return
+
+    async def _handle(
+        self, key: str, scope: Scope, body: bytes, send: Send
+    ) -> None:
+        handled = asyncio.get_running_loop().create_future()
+        self._handling[key] = handled
+        # status stays None if handling ends before response starts,
+        # sent is set once the last part of body reached the client
+        response = {"status": None, "headers": [], "body": [], "sent": False}
+        body_read = False
+
+        async def replay_body() -> Message:
+            nonlocal body_read
+            if body_read:
+                return {"type": "http.disconnect"}
+            body_read = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+                await send(message)
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                await send(message)
+                if not message.get("more_body"):
+                    response["sent"] = True
+            else:
+                await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        finally:
+            try:
+                if response["status"] is None:
+                    logger.warning(
+                        "Request with %s ended without response, key is "
+                        "held until lock timeout",
+                        key,
+                    )
+                elif response["status"] >= 500:
+                    await run_in_threadpool(self.store.release, key)
+                elif response["sent"]:
+                    await run_in_threadpool(
+                        self.store.complete,
+                        key,
+                        response["status"],
+                        b"".join(response["body"]),
+                        response["headers"],
+                    )
+                else:
+                    logger.warning(
+                        "Response to request with %s wasn't sent whole, "
+                        "key is held until lock timeout",
+                        key,
+                    )
+            except Exception:
+                logger.exception("Storing outcome of %s failed", key)
+            del self._handling[key]
+            handled.set_result(None)
+
+    async def _wait(self, key: str, deadline: float) -> bool:
+        """
+        Wait until request holding key is handled or time to poll
+        its outcome comes
+        :return: False if deadline passed
+        """
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        handled = self._handling.get(key)
+        if handled is None:
+            # handled by another worker
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(handled), remaining)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+def _idempotency_key(scope: Scope) -> str | None:
+    if scope["type"] != "http":
+        return None
+    if (scope["method"], scope["path"].rstrip("/")) not in ROUTES:
+        return None
+    for name, value in scope["headers"]:
+        if name == b"idempotency-key":
+            return value.decode("latin-1")
+    return None
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_json(
+    send: Send,
+    status: int,
+    body: bytes,
+    headers: list[tuple[bytes, bytes]] | None = None,
+) -> None:
+    await _send_response(
+        send,
+        status,
+        body,
+        [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *(headers or []),
+        ],
+    )
+
+
+async def _send_response(
+    send: Send, status: int, body: bytes, headers: list[tuple[bytes, bytes]]
+) -> None:
+    await send(
+        {"type": "http.response.start", "status": status, "headers": headers}
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+store = IdempotencyStore(
+    SessionLocal, ttl=IDEMPOTENCY_TTL, lock_timeout=IDEMPOTENCY_LOCK_TIMEOUT
+)
@@ -0,0 +1,292 @@
+import enum
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import any_, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas, stock_ledger
+from .database import id_array
+from .settings import ALLOCATION_STRATEGY
+
+
+class Strategy(str, enum.Enum):
+
+    nearest = "nearest"
+
+    fewest_splits = "fewest_splits"
+
+    priority = "priority"
+
+
+# parsed on import, so that invalid setting stops worker from starting
+DEFAULT_STRATEGY = Strategy(ALLOCATION_STRATEGY)
+
+
+@dataclass
+class Allocation:
+    """Quantity of product shipped from warehouse"""
+
+    product_id: int
+
+    # None for products without per-warehouse stock
+    warehouse_id: int | None
+
+    quantity: int
+
+    # price of product at allocation, set once allocation succeeds
+    unit_price: Decimal | None = None
+
+
+@dataclass
+class _Candidate:
+    warehouse_id: int
+
+    quantity: int
+
+    priority: int
+
+    distance: float
+
+
+def allocate(
+    db: Session,
+    items: list[schemas.OrderItemCreate],
+    location: schemas.Location | None = None,
+    strategy: Strategy = DEFAULT_STRATEGY,
+    order_id: int | None = None,
+) -> list[Allocation] | None:
+    """
+    Allocate order items to warehouses and take allocated quantities
+    from stock. Products without per-warehouse stock are taken from
+    their global stock quantity. Prices of products are read by the
+    same statements. Changes are not committed.
+    :param db: session object
+    :param items: order items
+    :param location: delivery location
+    :param strategy: allocation strategy
+    :param order_id: id of order items belong to
+    :return: allocations or None if there is not enough products in stock
+    """
+
+    demand: dict[int, int] = defaultdict(int)
+    for item in items:
+        demand[item.product_id] += item.quantity
+    if any(quantity <= 0 for quantity in demand.values()):
+        return None
+
+    candidates, prices = _lock_candidates(db, list(demand), location)
+
+    allocations = []
+    global_demand = {}
+    for product_id, quantity in demand.items():
+        if product_id not in candidates:
+            global_demand[product_id] = quantity
+            continue
+        product_allocations = _allocate_product(
+            product_id, quantity, candidates[product_id], strategy
+        )
+        if product_allocations is None:
+            return None
+        allocations.extend(product_allocations)
+
+    if global_demand:
+        global_prices = _take_global_stock(db, global_demand, order_id)
+        if global_prices is None:
+            return None
+        prices.update(global_prices)
+    _take_warehouse_stock(db, allocations)
+
+    allocations += [
+        Allocation(product_id, None, quantity)
+        for product_id, quantity in global_demand.items()
+    ]
+    for allocation in allocations:
+        allocation.unit_price = prices[allocation.product_id]
+    return allocations
+
+
+def _lock_candidates(
+    db: Session,
+    product_ids: list[int],
+    location: schemas.Location | None,
+) -> tuple[dict[int, list[_Candidate]], dict[int, Decimal]]:
+    """
+    Read and lock stock of given products in all warehouses
+    with one query
+    :return: warehouses with stock by product id and prices by product id
+    (products without per-warehouse stock are missing in both)
+    """
+
+    stmt = (
+        select(
+            models.WarehouseStock.product_id,
+            models.WarehouseStock.warehouse_id,
+            models.WarehouseStock.quantity,
+            models.Warehouse.priority,
+            models.Warehouse.latitude,
+            models.Warehouse.longitude,
+            models.Product.price,
+        )
+        .join(models.Warehouse)
+        .join(models.Product)
+        .where(
+            models.WarehouseStock.product_id == any_(id_array(product_ids)),
+            models.Product.deleted_at.is_(None),
+        )
+        # same lock order in all transactions, to avoid deadlocks
+        .order_by(
+            models.WarehouseStock.product_id,
+            models.WarehouseStock.warehouse_id,
+        )
+        .with_for_update(of=models.WarehouseStock)
+    )
+
+    candidates: dict[int, list[_Candidate]] = defaultdict(list)
+    prices = {}
+    for row in db.execute(stmt):
+        prices[row.product_id] = row.price
+        candidates[row.product_id].append(
+            _Candidate(
+                warehouse_id=row.warehouse_id,
+                quantity=row.quantity,
+                priority=row.priority,
+                distance=_distance(location, row.latitude, row.longitude),
+            )
+        )
+    return candidates, prices
+
+
+def _allocate_product(
+    product_id: int,
+    quantity: int,
+    candidates: list[_Candidate],
+    strategy: Strategy,
+) -> list[Allocation] | None:
+    """
+    :return: allocations of product or None if warehouses
+    don't have enough of it
+    """
+
+    candidates = [c for c in candidates if c.quantity > 0]
+    if sum(c.quantity for c in candidates) < quantity:
+        return None
+
+    if strategy is Strategy.nearest:
+        candidates.sort(key=lambda c: (c.distance, c.priority))
+    elif strategy is Strategy.priority:
+        candidates.sort(key=lambda c: (c.priority, c.distance))
+    else:
+        whole = [c for c in candidates if c.quantity >= quantity]
+        if whole:
+            candidates = [min(whole, key=lambda c: (c.distance, c.priority))]
+        else:
+            candidates.sort(key=lambda c: (-c.quantity, c.distance))
+
+    allocations = []
+    for candidate in candidates:
+        taken = min(quantity, candidate.quantity)
+        allocations.append(
+            Allocation(product_id, candidate.warehouse_id, taken)
+        )
+        quantity -= taken
+        if not quantity:
+            break
+    return allocations
+
+
+def _take_warehouse_stock(db: Session, allocations: list[Allocation]):
+    """Decrease stock of all allocated warehouses with one statement"""
+
+    if not allocations:
+        return
+    taken = func.unnest(
+        id_array([a.warehouse_id for a in allocations], "warehouse_ids"),
+        id_array([a.product_id for a in allocations], "product_ids"),
+        id_array([a.quantity for a in allocations], "quantities"),
+    ).table_valued("warehouse_id", "product_id", "quantity").render_derived()
+
+    db.execute(
+        update(models.WarehouseStock)
+        .where(
+            models.WarehouseStock.warehouse_id == taken.c.warehouse_id,
+            models.WarehouseStock.product_id == taken.c.product_id,
+        )
+        .values(quantity=models.WarehouseStock.quantity - taken.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _take_global_stock(
+    db: Session, demand: dict[int, int], order_id: int | None = None
+) -> dict[int, Decimal] | None:
+    """
+    Decrease stock quantity of products with one conditional statement,
+    or append movements to inventory ledger if it's enabled
+    :param demand: quantity by product id
+    :param order_id: id of order products are taken for
+    :return: prices by product id or None if any of products
+    doesn't have enough stock
+    """
+
+    if stock_ledger.ledger.enabled:
+        return stock_ledger.ledger.take(db, demand, order_id)
+
+    taken = func.unnest(
+        id_array(list(demand), "product_ids"),
+        id_array(list(demand.values()), "quantities"),
+    ).table_valued("product_id", "quantity").render_derived()
+    # same lock order in all transactions, to avoid deadlocks: join
+    # order of update is up to planner, so rows are locked beforehand
+    locked = (
+        select(models.Product.id)
+        .where(models.Product.id == any_(id_array(list(demand))))
+        .order_by(models.Product.id)
+        .with_for_update()
+        .cte("locked")
+        .prefix_with("MATERIALIZED")
+    )
+
+    updated = db.execute(
+        update(models.Product)
+        .where(
+            models.Product.id == locked.c.id,
+            models.Product.id == taken.c.product_id,
+            models.Product.stock_quantity >= taken.c.quantity,
+            models.Product.deleted_at.is_(None),
+        )
+        .values(
+            stock_quantity=models.Product.stock_quantity - taken.c.quantity,
+            version=models.Product.version + 1,
+        )
+        .returning(models.Product.id, models.Product.price)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if len(updated) != len(demand):
+        return None
+    return {pk: price for pk, price in updated}
+
+
+def _distance(
+    location: schemas.Location | None,
+    latitude: float | None,
+    longitude: float | None,
+) -> float:
+    """
+    :return: great-circle distance in km between delivery location and
+    warehouse, infinity if any of locations is unknown
+    """
+
+    if location is None or latitude is None or longitude is None:
+        return math.inf
+
+    lat1 = math.radians(location.latitude)
+    lon1 = math.radians(location.longitude)
+    lat2, lon2 = math.radians(latitude), math.radians(longitude)
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371 * math.asin(math.sqrt(a))
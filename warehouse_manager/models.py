@@ -5,7 +5,20 @@ from typing_extensions import Annotated
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
-from sqlalchemy import String, Numeric, func, Enum, ForeignKey, Column
+from sqlalchemy import (
+    BigInteger,
+    String,
+    Numeric,
+    func,
+    Enum,
+    ForeignKey,
+    Column,
+    CheckConstraint,
+    Index,
+    JSON,
+    LargeBinary,
+    text,
+)
 
 from .database import Base
 
@@ -34,6 +47,22 @@ class OrderStatusEnum(enum.Enum):
     delivered = "доставлен"
 
 
+# statuses order may move to from each status, only forward
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatusEnum.processed: (
+        OrderStatusEnum.in_progress,
+        OrderStatusEnum.sent,
+        OrderStatusEnum.delivered,
+    ),
+    OrderStatusEnum.in_progress: (
+        OrderStatusEnum.sent,
+        OrderStatusEnum.delivered,
+    ),
+    OrderStatusEnum.sent: (OrderStatusEnum.delivered,),
+    OrderStatusEnum.delivered: (),
+}
+
+
 status = Annotated[
     Enum(OrderStatusEnum),
     mapped_column(default=OrderStatusEnum.in_progress, nullable=False),
@@ -46,7 +75,8 @@ class Product(Base):
 
     id: Mapped[intpk]
 
-    name: Mapped[str] = mapped_column(String(30), unique=True, index=True)
+    # unique among products which aren't deleted
+    name: Mapped[str] = mapped_column(String(30))
 
     description: Mapped[str]
 
@@ -54,6 +84,30 @@ class Product(Base):
 
     stock_quantity: Mapped[int] = mapped_column(default=0)
 
+    # incremented on every change, used for optimistic concurrency control
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
+
+    # set by soft delete, deleted products are hidden from all reads
+    deleted_at: Mapped[datetime.datetime | None]
+
+    # set when deleted product referenced by orders is anonymized by purge
+    purged_at: Mapped[datetime.datetime | None]
+
+    __table_args__ = (
+        Index(
+            "ix_product_name",
+            "name",
+            unique=True,
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # listing of products skips deleted ones without reading them
+        Index(
+            "ix_product_live",
+            "id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
+
     def __repr__(self):
         return self.name
 
@@ -72,6 +126,13 @@ class Order(Base):
         nullable=False,
     )
 
+    # denormalized from items when order is created, so listings show
+    # order value without reading items and products
+    total_price: Mapped[float] = mapped_column(Numeric(12, 2), default=0)
+
+    # total quantity of ordered products
+    item_count: Mapped[int] = mapped_column(default=0)
+
     items: Mapped[list["OrderItem"]] = relationship(back_populates="order")
 
 
@@ -83,8 +144,152 @@ class OrderItem(Base):
 
     order_id: Mapped[int] = mapped_column(ForeignKey("order.id"))
 
-    product_id: Mapped[int] = mapped_column(ForeignKey("product.id"))
+    # indexed for foreign key checks and purge of deleted products
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("product.id"), index=True
+    )
+
+    # warehouse item is shipped from, None for products without
+    # per-warehouse stock
+    warehouse_id: Mapped[int | None] = mapped_column(
+        ForeignKey("warehouse.id")
+    )
 
     quantity: Mapped[int]
 
+    # price of product at the moment order was created
+    unit_price: Mapped[float] = mapped_column(Numeric(10, 2))
+
     order: Mapped["Order"] = relationship(back_populates="items")
+
+
+class Warehouse(Base):
+
+    __tablename__ = "warehouse"
+
+    id: Mapped[intpk]
+
+    name: Mapped[str] = mapped_column(String(50), unique=True)
+
+    latitude: Mapped[float | None]
+
+    longitude: Mapped[float | None]
+
+    # lower is preferred when warehouses are equally suitable
+    priority: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    def __repr__(self):
+        return self.name
+
+
+class WarehouseStock(Base):
+
+    __tablename__ = "warehouse_stock"
+
+    warehouse_id: Mapped[int] = mapped_column(
+        ForeignKey("warehouse.id"), primary_key=True
+    )
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("product.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    quantity: Mapped[int] = mapped_column(default=0)
+
+    __table_args__ = (
+        CheckConstraint("quantity >= 0", name="warehouse_stock_quantity"),
+        # allocation reads all warehouses of ordered products
+        Index(
+            "ix_warehouse_stock_product",
+            "product_id",
+            "warehouse_id",
+            postgresql_include=["quantity"],
+        ),
+    )
+
+
+class StockMovement(Base):
+    """Change of product stock quantity, rows are only inserted"""
+
+    __tablename__ = "stock_movement"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("product.id", ondelete="CASCADE")
+    )
+
+    delta: Mapped[int]
+
+    # order, adjustment
+    reason: Mapped[str] = mapped_column(String(20))
+
+    order_id: Mapped[int | None] = mapped_column(
+        ForeignKey("order.id", ondelete="SET NULL")
+    )
+
+    created_at: Mapped[timestamp]
+
+    __table_args__ = (
+        # current stock sums deltas of product
+        Index(
+            "ix_stock_movement_product",
+            "product_id",
+            "created_at",
+            postgresql_include=["delta"],
+        ),
+        # compaction takes oldest movements
+        Index("ix_stock_movement_created_at", "created_at"),
+    )
+
+
+class StockSnapshot(Base):
+    """
+    Product stock quantity after compaction, movements created before
+    horizon are folded into it
+    """
+
+    __tablename__ = "stock_snapshot"
+
+    id: Mapped[intpk]
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("product.id", ondelete="CASCADE")
+    )
+
+    quantity: Mapped[int]
+
+    horizon: Mapped[datetime.datetime]
+
+    taken_at: Mapped[timestamp]
+
+    __table_args__ = (
+        Index("ix_stock_snapshot_product", "product_id", "horizon"),
+    )
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of write request sent with Idempotency-Key header, replayed
+    to retries and duplicates of the request
+    """
+
+    __tablename__ = "idempotency_key"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+
+    # hash of method, path and body of request
+    fingerprint: Mapped[str] = mapped_column(String(64))
+
+    # None while request is being handled
+    status_code: Mapped[int | None]
+
+    body: Mapped[bytes | None] = mapped_column(LargeBinary)
+
+    # [name, value] pairs of response headers, latin-1 decoded
+    headers: Mapped[list | None] = mapped_column(JSON)
+
+    # lease of request handler, key can be claimed again after it ends
+    locked_until: Mapped[datetime.datetime | None]
+
+    expires_at: Mapped[datetime.datetime] = mapped_column(index=True)
@@ -0,0 +1,223 @@
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .settings import PROFILING_DIR, PROFILING_KEEP
+
+
+# (file name, function) of frames where idle threads are parked
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+PROFILE_SUFFIX = ".folded"
+
+
+class StackSampler(threading.Thread):
+    """
+    Statistical profiler sampling stacks of all busy threads of process.
+
+    Sync handlers, dependencies and response serialization run in
+    threadpool, so instead of tracing single thread (cProfile) stacks of
+    every thread are sampled while request is handled. Samples of other
+    requests handled at the same time are included too.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True, name="stack-sampler")
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or _is_idle(frame):
+                    continue
+                self.stacks[_collapse(frame)] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+@dataclass
+class ProfileInfo:
+    """Saved request profile"""
+
+    name: str
+
+    size: int
+
+    created_at: datetime
+
+
+class ProfileStore:
+    """Directory with profiles in collapsed stack (flamegraph) format"""
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+
+    def save(
+        self, method: str, path: str, duration: float, stacks: Counter[str]
+    ) -> str:
+        """
+        :param method: request method
+        :param path: request path
+        :param duration: request duration in seconds
+        :param stacks: sampled stacks with their counts
+        :return: name of saved profile
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        slug = re.sub(r"[^\w-]+", "_", path.strip("/")) or "root"
+        name = (
+            f"{stamp}-{method}-{slug}-{duration * 1000:.0f}ms-{os.getpid()}"
+            f"{PROFILE_SUFFIX}"
+        )
+        with open(os.path.join(self.directory, name), "w") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        self._prune()
+        return name
+
+    def list(self) -> list[ProfileInfo]:
+        """
+        :return: saved profiles, most recent first
+        """
+
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(PROFILE_SUFFIX)
+            ]
+        except FileNotFoundError:
+            return []
+        entries.sort(key=lambda entry: entry.name, reverse=True)
+        return [
+            ProfileInfo(
+                name=entry.name,
+                size=entry.stat().st_size,
+                created_at=datetime.fromtimestamp(
+                    entry.stat().st_mtime, timezone.utc
+                ),
+            )
+            for entry in entries
+        ]
+
+    def path(self, name: str) -> str | None:
+        """
+        :param name: profile name
+        :return: path to profile file or None if there is no such profile
+        """
+
+        if os.path.basename(name) != name or not name.endswith(
+            PROFILE_SUFFIX
+        ):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def _prune(self) -> None:
+        for info in self.list()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, info.name))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests sent with privileged header
+    or randomly chosen ones with given sample rate.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        token: str | None,
+        sample_rate: float = 0.0,
+        interval: float = 0.002,
+        header: str = "x-profile",
+    ):
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.header = header.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._triggered(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - started
+            # write profile off the event loop, once sampler is done
+            threading.Thread(
+                target=self._save,
+                args=(sampler, scope["method"], scope["path"], duration),
+                daemon=True,
+            ).start()
+
+    def _triggered(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if not self.token:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return hmac.compare_digest(value, self.token.encode())
+        return False
+
+    def _save(
+        self, sampler: StackSampler, method: str, path: str, duration: float
+    ) -> None:
+        sampler.join()
+        if sampler.stacks:
+            self.store.save(method, path, duration, sampler.stacks)
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _collapse(frame) -> str:
+    """
+    :param frame: leaf frame of thread
+    :return: stack from root to leaf in collapsed stack format
+    """
+
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+store = ProfileStore(PROFILING_DIR, PROFILING_KEEP)
@@ -1,6 +1,16 @@
 from datetime import datetime
+from typing import Any
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    field_validator,
+    model_validator,
+)
+
+from .models import OrderStatusEnum
+from .settings import BULK_MAX_IDS, MAX_LOOKUP_IDS
 
 
 class ProductBase(BaseModel):
@@ -25,10 +35,186 @@ class ProductUpdate(ProductBase):
     pass
 
 
+class ProductPatch(BaseModel):
+
+    name: str | None = None
+
+    description: str | None = None
+
+    price: float | None = Field(
+        default=None, gt=0, description="The price must be greater than zero"
+    )
+
+    stock_quantity: int | None = None
+
+
 class Product(ProductBase):
 
     id: int
 
+    version: int = Field(
+        description="Incremented on every change, sent as ETag"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class StockLevel(BaseModel):
+
+    product_id: int
+
+    quantity: int
+
+    exact: bool = Field(
+        description="False if quantity is taken from the nearest older "
+        "snapshot, as movements at that moment aren't retained"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductFilter(BaseModel):
+
+    name: str | None = Field(
+        default=None, description="Part of name, case insensitive"
+    )
+
+    price_from: float | None = None
+
+    price_to: float | None = Field(default=None, description="Exclusive")
+
+    stock_from: int | None = None
+
+    stock_to: int | None = Field(default=None, description="Exclusive")
+
+
+class StockAdjustment(BaseModel):
+
+    set: int | None = Field(default=None, ge=0)
+
+    increment: int | None = Field(
+        default=None, description="Negative to decrease stock"
+    )
+
+    @model_validator(mode="after")
+    def one_of(self) -> "StockAdjustment":
+        if (self.set is None) == (self.increment is None):
+            raise ValueError("Either 'set' or 'increment' should be given")
+        return self
+
+
+class PriceAdjustment(BaseModel):
+
+    set: float | None = Field(default=None, gt=0)
+
+    percent: float | None = Field(
+        default=None, gt=-100, description="Negative to decrease price"
+    )
+
+    @model_validator(mode="after")
+    def one_of(self) -> "PriceAdjustment":
+        if (self.set is None) == (self.percent is None):
+            raise ValueError("Either 'set' or 'percent' should be given")
+        return self
+
+
+class ProductBulkAdjust(BaseModel):
+
+    ids: list[int] | None = Field(
+        default=None,
+        min_length=1,
+        max_length=BULK_MAX_IDS,
+        description=f"Up to {BULK_MAX_IDS} ids of products to adjust",
+    )
+
+    filter: ProductFilter | None = Field(
+        default=None, description="Adjust products matching filter instead"
+    )
+
+    stock: StockAdjustment | None = None
+
+    price: PriceAdjustment | None = None
+
+    dry_run: bool = Field(
+        default=False, description="Only count products to be adjusted"
+    )
+
+    @model_validator(mode="after")
+    def selection_and_adjustment(self) -> "ProductBulkAdjust":
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Either 'ids' or 'filter' should be given")
+        if self.stock is None and self.price is None:
+            raise ValueError("'stock' or 'price' adjustment should be given")
+        return self
+
+
+class ProductBulkResult(BaseModel):
+
+    affected: int = Field(
+        description="Count of adjusted products (to be adjusted on dry run)"
+    )
+
+    skipped: list[int] = Field(
+        description="Products left as is, as their stock would be negative "
+        "or price not positive"
+    )
+
+    missing: list[int] = Field(description="Requested ids with no match")
+
+    dry_run: bool
+
+
+class ProductLookup(BaseModel):
+
+    items: list[Product]
+
+    missing: list[int] = Field(description="Requested ids with no match")
+
+
+# warehouse section
+class Location(BaseModel):
+
+    latitude: float = Field(ge=-90, le=90)
+
+    longitude: float = Field(ge=-180, le=180)
+
+
+class WarehouseBase(BaseModel):
+
+    name: str = Field(max_length=50)
+
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+
+    longitude: float | None = Field(default=None, ge=-180, le=180)
+
+    priority: int = Field(
+        default=0,
+        description="Lower is preferred when warehouses are equally suitable",
+    )
+
+
+class WarehouseCreate(WarehouseBase):
+    pass
+
+
+class Warehouse(WarehouseBase):
+
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WarehouseStockSet(BaseModel):
+
+    product_id: int
+
+    quantity: int = Field(ge=0, description="Can't be negative")
+
+
+class WarehouseStock(WarehouseStockSet):
+
+    warehouse_id: int
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -51,6 +237,16 @@ class OrderItem(OrderItemBase):
 
     quantity: int = Field(gt=0, description="Can't be less than 1")
 
+    warehouse_id: int | None = Field(
+        default=None,
+        description="Warehouse item is shipped from, "
+        "None for products without per-warehouse stock",
+    )
+
+    unit_price: float = Field(
+        description="Price of product at the moment order was created"
+    )
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -63,6 +259,12 @@ class OrderCreate(OrderBase):
 
     items: list[OrderItemCreate]
 
+    ship_to: Location | None = Field(
+        default=None,
+        description="Delivery location, items are shipped "
+        "from nearest warehouses",
+    )
+
 
 class Order(OrderBase):
 
@@ -70,6 +272,181 @@ class Order(OrderBase):
 
     created_at: datetime
 
+    total_price: float = Field(description="Total price of all items")
+
+    item_count: int = Field(description="Total quantity of all items")
+
     items: list[OrderItem]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class OrderLookup(BaseModel):
+
+    items: list[Order]
+
+    missing: list[int] = Field(description="Requested ids with no match")
+
+
+class OrderFilter(BaseModel):
+
+    status: str | None = Field(default=None, description="Current status")
+
+    created_from: datetime | None = None
+
+    created_to: datetime | None = Field(default=None, description="Exclusive")
+
+    @field_validator("status")
+    @classmethod
+    def status_exists(cls, value: str | None) -> str | None:
+        return _order_status(value) if value is not None else None
+
+
+class OrderStatusBulkUpdate(BaseModel):
+
+    status: str = Field(description="New status of orders")
+
+    ids: list[int] | None = Field(
+        default=None,
+        min_length=1,
+        max_length=BULK_MAX_IDS,
+        description=f"Up to {BULK_MAX_IDS} ids of orders to update",
+    )
+
+    filter: OrderFilter | None = Field(
+        default=None, description="Update orders matching filter instead"
+    )
+
+    @field_validator("status")
+    @classmethod
+    def status_exists(cls, value: str) -> str:
+        return _order_status(value)
+
+    @model_validator(mode="after")
+    def ids_or_filter(self) -> "OrderStatusBulkUpdate":
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Either 'ids' or 'filter' should be given")
+        return self
+
+
+class OrderStatusBulkResult(BaseModel):
+
+    updated: list[int]
+
+    skipped: list[int] = Field(
+        description="Orders which can't move to the new status "
+        "from their current one"
+    )
+
+    missing: list[int] = Field(description="Requested ids with no match")
+
+
+def _order_status(value: str) -> str:
+    if value not in OrderStatusEnum.__members__:
+        raise ValueError(
+            f"Unknown status, one of {', '.join(OrderStatusEnum.__members__)}"
+            " expected"
+        )
+    return value
+
+
+# multi-get section
+class LookupRequest(BaseModel):
+
+    ids: list[int] = Field(
+        min_length=1,
+        max_length=MAX_LOOKUP_IDS,
+        description=f"Up to {MAX_LOOKUP_IDS} ids to resolve",
+    )
+
+
+# admin section
+class ProfileInfo(BaseModel):
+
+    name: str
+
+    size: int
+
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SlowQuery(BaseModel):
+
+    statement: str
+
+    parameters: Any = Field(description="Bound parameters, values redacted")
+
+    duration_ms: float
+
+    route: str | None
+
+    crud_function: str | None
+
+    explain: str | None = Field(
+        description="EXPLAIN (ANALYZE, BUFFERS) output, if captured"
+    )
+
+    recorded_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AdmissionClassStats(BaseModel):
+
+    concurrency_limit: int
+
+    queue_limit: int
+
+    admitted: int
+
+    queued: int
+
+    rejected: int
+
+    timed_out: int
+
+    in_flight: int
+
+    queue_depth: int
+
+
+class AdmissionStats(BaseModel):
+
+    limit: int = Field(description="Max count of requests handled at once")
+
+    in_flight: int
+
+    classes: dict[str, AdmissionClassStats]
+
+
+class CoalescingStats(BaseModel):
+
+    requests: int
+
+    leaders: int = Field(description="Reads which queried the database")
+
+    followers: int = Field(description="Reads which reused leader's result")
+
+    bypassed: int = Field(description="Reads not coalesced, table was full")
+
+    ratio: float = Field(description="Share of reads served by followers")
+
+    in_flight: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CompactionResult(BaseModel):
+
+    products: int = Field(description="Count of compacted products")
+
+
+class Health(BaseModel):
+
+    status: str
+
+    warmup_ms: float | None = Field(
+        default=None, description="Duration of worker warm-up"
+    )
@@ -6,3 +6,124 @@ load_dotenv()
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# max count of ids accepted by a single multi-get request
+MAX_LOOKUP_IDS = int(os.getenv("MAX_LOOKUP_IDS", 100))
+
+# max count of ids accepted by a single bulk update request
+BULK_MAX_IDS = int(os.getenv("BULK_MAX_IDS", 10000))
+# max count of rows changed by one statement (and transaction)
+# of bulk update
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+
+# catalog snapshot: serialized product list pages cached in memory
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT_ENABLED", "1") == "1"
+CATALOG_SNAPSHOT_MAX_PAGES = int(os.getenv("CATALOG_SNAPSHOT_MAX_PAGES", 64))
+# seconds, bounds staleness of pages changed through other workers
+CATALOG_SNAPSHOT_TTL = float(os.getenv("CATALOG_SNAPSHOT_TTL", 5))
+# seconds between background rebuilds of dropped pages, 0 to build them
+# only on read
+CATALOG_SNAPSHOT_REBUILD_INTERVAL = float(
+    os.getenv("CATALOG_SNAPSHOT_REBUILD_INTERVAL", 1)
+)
+
+# connection pool of each worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+# executions of statement on connection after which it is prepared
+# server-side, only with psycopg 3 driver (postgresql+psycopg://),
+# empty to disable (needed behind pgbouncer in transaction mode)
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "5")
+
+# warm-up of worker before it reports readiness at /health/ready
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+# pool connections opened in advance, up to DB_POOL_SIZE
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 2))
+
+# token expected in X-Admin-Token header of admin endpoints
+# (and in X-Profile header to profile request), admin endpoints
+# are disabled if not set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# request profiling
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.002))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", 100))
+
+# slow query log
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "1") == "1"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", 200))
+# share of slow SELECT statements to capture EXPLAIN (ANALYZE, BUFFERS) for
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0)
+)
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE")
+SLOW_QUERY_LOG_MAX_BYTES = int(
+    os.getenv("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024)
+)
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", 5))
+
+# admission control, sized by connection pool of worker
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# max count of waiting requests of route class, relative to pool size
+ADMISSION_QUEUE_FACTOR = float(os.getenv("ADMISSION_QUEUE_FACTOR", 2))
+# seconds request may wait for admission before 503
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2))
+# share of connections listing and lookup requests may take
+ADMISSION_READ_SHARE = float(os.getenv("ADMISSION_READ_SHARE", 0.8))
+# value of Retry-After header of rejected requests, seconds
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+# coalescing of identical concurrent reads
+COALESCING_ENABLED = os.getenv("COALESCING_ENABLED", "1") == "1"
+# max count of distinct reads in flight coalesced at the same time
+COALESCING_MAX_KEYS = int(os.getenv("COALESCING_MAX_KEYS", 1024))
+
+# how order lines are allocated to warehouses:
+# nearest - from warehouses nearest to delivery location, split if needed
+# fewest_splits - from single warehouse if possible, else largest stocks
+# priority - by warehouse priority
+ALLOCATION_STRATEGY = os.getenv("ALLOCATION_STRATEGY", "nearest")
+
+# inventory ledger: stock changes of products are appended as movements
+# instead of overwriting product stock quantity
+INVENTORY_LEDGER_ENABLED = os.getenv("INVENTORY_LEDGER_ENABLED", "0") == "1"
+# seconds movements are kept before they are folded into product stock
+# quantity, stock at any moment within this window is exact
+INVENTORY_LEDGER_RETENTION = float(
+    os.getenv("INVENTORY_LEDGER_RETENTION", 60)
+)
+# seconds between compactions
+INVENTORY_COMPACTION_INTERVAL = float(
+    os.getenv("INVENTORY_COMPACTION_INTERVAL", 30)
+)
+
+# purge of soft-deleted products
+PRODUCT_PURGE_ENABLED = os.getenv("PRODUCT_PURGE_ENABLED", "1") == "1"
+# seconds deleted product is kept before it is purged
+PRODUCT_PURGE_DELAY = float(os.getenv("PRODUCT_PURGE_DELAY", 3600))
+# max count of products purged in one transaction
+PRODUCT_PURGE_BATCH = int(os.getenv("PRODUCT_PURGE_BATCH", 100))
+# seconds between purges
+PRODUCT_PURGE_INTERVAL = float(os.getenv("PRODUCT_PURGE_INTERVAL", 60))
+
+# Idempotency-Key support of order creation and bulk writes
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "1") == "1"
+# seconds response is kept for replays
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+# seconds request handler holds the key, after that (e.g. if worker
+# died) duplicate may handle request again
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+# seconds duplicate waits for response of the first request before 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+# seconds between polls of key handled by another worker
+IDEMPOTENCY_POLL_INTERVAL = float(
+    os.getenv("IDEMPOTENCY_POLL_INTERVAL", 0.05)
+)
+# seconds between removals of expired keys
+IDEMPOTENCY_CLEANUP_INTERVAL = float(
+    os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL", 300)
+)
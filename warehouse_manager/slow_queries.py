@@ -0,0 +1,267 @@
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .settings import (
+    SLOW_QUERY_BUFFER,
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    SLOW_QUERY_LOG_BACKUPS,
+    SLOW_QUERY_LOG_FILE,
+    SLOW_QUERY_LOG_MAX_BYTES,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# route of request being handled, set by RouteContextMiddleware
+current_route: ContextVar[str | None] = ContextVar(
+    "current_route", default=None
+)
+
+CRUD_MODULE = "warehouse_manager.crud"
+
+# row locking clause of SELECT, such statements aren't run again
+# by EXPLAIN ANALYZE: it would lock their rows once more
+LOCKING_CLAUSE = re.compile(
+    r"\bFOR\s+(UPDATE|NO\s+KEY\s+UPDATE|SHARE|KEY\s+SHARE)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class SlowQuery:
+    """Statement which took longer than threshold"""
+
+    statement: str
+
+    parameters: Any
+
+    duration_ms: float
+
+    route: str | None
+
+    crud_function: str | None
+
+    explain: str | None = None
+
+    recorded_at: datetime = field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
+
+
+class SlowQueryLog:
+    """
+    Collects statements slower than threshold using engine events.
+
+    Recent records are kept in bounded in-memory ring buffer and written
+    to rotating log file (if configured). EXPLAIN (ANALYZE, BUFFERS) is
+    captured for given share of slow SELECT statements, plain EXPLAIN
+    for locking ones.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float,
+        capacity: int,
+        explain_sample_rate: float = 0.0,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self._records: deque[SlowQuery] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def install(self, engine: Engine) -> None:
+        """
+        :param engine: engine which statements should be timed
+        """
+
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def uninstall(self, engine: Engine) -> None:
+        """
+        :param engine: engine previously passed to install
+        """
+
+        event.remove(engine, "before_cursor_execute", self._before_execute)
+        event.remove(engine, "after_cursor_execute", self._after_execute)
+        event.remove(engine, "handle_error", self._handle_error)
+
+    def records(self) -> list[SlowQuery]:
+        """
+        :return: recorded slow queries, most recent first
+        """
+
+        with self._lock:
+            return list(reversed(self._records))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    def _before_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _handle_error(self, context) -> None:
+        # failed statement isn't timed, drop its start
+        if context.connection is None or context.statement is None:
+            return
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+    def _after_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started = conn.info["query_started"].pop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        record = SlowQuery(
+            statement=statement,
+            parameters=redact(parameters),
+            duration_ms=round(duration_ms, 3),
+            route=current_route.get(),
+            crud_function=_crud_function(),
+        )
+        if (
+            not executemany
+            and conn.dialect.name == "postgresql"
+            and statement.lstrip()[:6].upper() == "SELECT"
+            and random.random() < self.explain_sample_rate
+        ):
+            record.explain = _explain(
+                cursor,
+                statement,
+                parameters,
+                analyze=not LOCKING_CLAUSE.search(statement),
+            )
+
+        with self._lock:
+            self._records.append(record)
+        logger.warning(json.dumps(asdict(record), default=str))
+
+
+class RouteContextMiddleware:
+    """Make route of current request available for slow query log"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_route.set(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
+
+
+def redact(parameters: Any) -> Any:
+    """
+    :param parameters: bound parameters of statement
+    :return: parameters with values replaced by their types
+    """
+
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def _redact_value(value: Any) -> str:
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def _crud_function() -> str | None:
+    """
+    :return: name of crud function which executes current statement
+    """
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get("__name__") == CRUD_MODULE:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+
+def _explain(
+    cursor, statement: str, parameters: Any, analyze: bool = True
+) -> str | None:
+    """
+    Run EXPLAIN (ANALYZE, BUFFERS) for already executed statement
+    in a savepoint, so that its failure doesn't affect transaction
+    :param cursor: DBAPI cursor statement was executed with
+    :param analyze: execute statement again, False for plan only
+    :return: query plan or None if it couldn't be captured
+    """
+
+    explain = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(explain + statement, parameters)
+            plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except Exception:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            logger.exception("Failed to explain slow query")
+            return None
+    except Exception:
+        logger.exception("Failed to explain slow query")
+        return None
+    finally:
+        explain_cursor.close()
+
+
+def _configure_logger() -> None:
+    if not SLOW_QUERY_LOG_FILE:
+        return
+    handler = RotatingFileHandler(
+        SLOW_QUERY_LOG_FILE,
+        maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+        backupCount=SLOW_QUERY_LOG_BACKUPS,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+_configure_logger()
+
+log = SlowQueryLog(
+    threshold_ms=SLOW_QUERY_THRESHOLD_MS,
+    capacity=SLOW_QUERY_BUFFER,
+    explain_sample_rate=SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+)
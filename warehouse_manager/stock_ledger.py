@@ -0,0 +1,312 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable
+
+from sqlalchemy import any_, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import background, models
+from .database import id_array
+from .settings import (
+    INVENTORY_COMPACTION_INTERVAL,
+    INVENTORY_LEDGER_ENABLED,
+    INVENTORY_LEDGER_RETENTION,
+)
+
+
+# first keys of advisory locks taken by ledger
+PRODUCT_LOCK = 0x5704
+COMPACTION_LOCK = 0x5705
+
+
+@dataclass
+class StockLevel:
+    """Stock quantity of product at some moment"""
+
+    product_id: int
+
+    quantity: int
+
+    # False if moment precedes retained movements and quantity
+    # is taken from the nearest older snapshot
+    exact: bool
+
+
+class StockLedger:
+    """
+    Inventory ledger: stock of product is its stock quantity (snapshot)
+    plus movements appended since last compaction.
+
+    Movements are only inserted, so orders don't rewrite stock quantity
+    of product row, they only bump its version (ETag of product changes
+    with its stock). Decrements of the same product are serialized with
+    transaction-level advisory locks, to keep stock non-negative.
+
+    Compaction folds movements older than retention into product stock
+    quantity and records snapshot of it, so stock at any moment within
+    retention is exact and at moments before it is resolved to the
+    nearest older snapshot.
+    """
+
+    def __init__(self, retention: float, enabled: bool = True):
+        self.retention = retention
+        self.enabled = enabled
+
+    def current(self, db: Session, product_ids: list[int]) -> dict[int, int]:
+        """
+        :param db: session object
+        :param product_ids: product ids
+        :return: current stock quantity by product id (products which
+        don't exist are missing)
+        """
+
+        levels = self._levels(db, product_ids)
+        return {pk: quantity for pk, quantity, _ in levels}
+
+    def take(
+        self,
+        db: Session,
+        demand: dict[int, int],
+        order_id: int | None = None,
+    ) -> dict[int, Decimal] | None:
+        """
+        Append movements taking given quantities from stock and bump
+        versions of products. Changes are not committed.
+        :param db: session object
+        :param demand: quantity by product id
+        :param order_id: id of order products are taken for
+        :return: prices by product id or None if any of products
+        doesn't have enough stock
+        """
+
+        product_ids = sorted(demand)
+        self._lock(db, product_ids)
+        levels = {
+            pk: (quantity, price)
+            for pk, quantity, price in self._levels(db, product_ids)
+        }
+        if any(
+            pk not in levels or levels[pk][0] < demand[pk]
+            for pk in product_ids
+        ):
+            return None
+
+        db.execute(
+            insert(models.StockMovement),
+            [
+                {
+                    "product_id": pk,
+                    "delta": -demand[pk],
+                    "reason": "order",
+                    "order_id": order_id,
+                }
+                for pk in product_ids
+            ],
+        )
+        # writes made with If-Match of version read before are rejected
+        db.execute(
+            update(models.Product)
+            .where(models.Product.id == any_(id_array(product_ids)))
+            .values(version=models.Product.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return {pk: price for pk, (_, price) in levels.items()}
+
+    def adjust(self, db: Session, product_id: int, quantity: int) -> None:
+        """
+        Append movement setting stock of product to given quantity.
+        Changes are not committed.
+        :param db: session object
+        :param product_id: product id
+        :param quantity: new stock quantity
+        """
+
+        self._lock(db, [product_id])
+        current = self.current(db, [product_id]).get(product_id)
+        if current is None or current == quantity:
+            return
+
+        db.execute(
+            insert(models.StockMovement).values(
+                product_id=product_id,
+                delta=quantity - current,
+                reason="adjustment",
+            )
+        )
+
+    def at(
+        self, db: Session, product_id: int, moment: datetime
+    ) -> StockLevel | None:
+        """
+        :param db: session object
+        :param product_id: product id
+        :param moment: point in time
+        :return: stock of product at given moment or None if product
+        doesn't exist or there is no history that old
+        """
+
+        compacted_later = (
+            select(models.StockSnapshot.id)
+            .where(
+                models.StockSnapshot.product_id == product_id,
+                models.StockSnapshot.horizon > moment,
+            )
+            .exists()
+        )
+        delta = (
+            select(func.coalesce(func.sum(models.StockMovement.delta), 0))
+            .where(
+                models.StockMovement.product_id == product_id,
+                models.StockMovement.created_at <= moment,
+            )
+            .scalar_subquery()
+        )
+        row = db.execute(
+            select(
+                models.Product.stock_quantity,
+                delta.label("delta"),
+                compacted_later.label("compacted_later"),
+            ).where(
+                models.Product.id == product_id,
+                models.Product.deleted_at.is_(None),
+            )
+        ).one_or_none()
+        if row is None:
+            return None
+        if not row.compacted_later:
+            return StockLevel(product_id, row.stock_quantity + row.delta, True)
+
+        quantity = db.execute(
+            select(models.StockSnapshot.quantity)
+            .where(
+                models.StockSnapshot.product_id == product_id,
+                models.StockSnapshot.horizon <= moment,
+            )
+            .order_by(models.StockSnapshot.horizon.desc())
+            .limit(1)
+        ).scalar()
+        if quantity is None:
+            return None
+        return StockLevel(product_id, quantity, False)
+
+    def compact(
+        self, db: Session, retention: float | None = None
+    ) -> int | None:
+        """
+        Fold movements older than retention into stock quantity of their
+        products and record snapshots, with one statement
+        :param db: session object
+        :param retention: seconds movements are kept, ledger retention
+        by default
+        :return: count of compacted products or None if compaction
+        is already running in another process
+        """
+
+        if retention is None:
+            retention = self.retention
+        if not db.execute(
+            select(func.pg_try_advisory_xact_lock(COMPACTION_LOCK, 0))
+        ).scalar():
+            db.rollback()
+            return None
+
+        # evaluated once, referenced by deletion and snapshots
+        horizon_cte = select(
+            (func.clock_timestamp() - timedelta(seconds=retention)).label(
+                "at"
+            )
+        ).cte("horizon")
+        horizon = select(horizon_cte.c.at).scalar_subquery()
+        folded = (
+            delete(models.StockMovement)
+            .where(models.StockMovement.created_at < horizon)
+            .returning(
+                models.StockMovement.product_id, models.StockMovement.delta
+            )
+            .cte("folded")
+        )
+        totals = (
+            select(
+                folded.c.product_id,
+                func.sum(folded.c.delta).label("delta"),
+            )
+            .group_by(folded.c.product_id)
+            .cte("totals")
+        )
+        compacted = (
+            update(models.Product)
+            .where(models.Product.id == totals.c.product_id)
+            # version isn't bumped: current stock doesn't change
+            .values(
+                stock_quantity=models.Product.stock_quantity + totals.c.delta
+            )
+            .returning(models.Product.id, models.Product.stock_quantity)
+            .cte("compacted")
+        )
+        result = db.execute(
+            insert(models.StockSnapshot).from_select(
+                ["product_id", "quantity", "horizon"],
+                select(compacted.c.id, compacted.c.stock_quantity, horizon),
+            )
+        )
+        db.commit()
+
+        return result.rowcount
+
+    def _levels(self, db: Session, product_ids: list[int]):
+        """:return: rows of id, current stock quantity and price"""
+
+        stmt = (
+            select(
+                models.Product.id,
+                models.Product.stock_quantity
+                + func.coalesce(func.sum(models.StockMovement.delta), 0),
+                models.Product.price,
+            )
+            .outerjoin(
+                models.StockMovement,
+                models.StockMovement.product_id == models.Product.id,
+            )
+            .where(
+                models.Product.id == any_(id_array(product_ids)),
+                models.Product.deleted_at.is_(None),
+            )
+            .group_by(models.Product.id)
+        )
+        return db.execute(stmt).all()
+
+    def _lock(self, db: Session, product_ids: list[int]) -> None:
+        """Lock products in given order until end of transaction"""
+
+        locked = (
+            func.unnest(id_array(product_ids))
+            .table_valued("id")
+            .render_derived()
+        )
+        db.execute(
+            select(func.pg_advisory_xact_lock(PRODUCT_LOCK, locked.c.id))
+        )
+
+
+ledger = StockLedger(
+    retention=INVENTORY_LEDGER_RETENTION, enabled=INVENTORY_LEDGER_ENABLED
+)
+
+
+def start_compactor(
+    session_factory: Callable[[], Session]
+) -> background.PeriodicTask:
+    """
+    :param session_factory: factory of sessions compactor uses
+    :return: started periodic compaction of ledger
+    """
+
+    compactor = background.PeriodicTask(
+        "inventory-compactor",
+        ledger.compact,
+        session_factory,
+        interval=INVENTORY_COMPACTION_INTERVAL,
+    )
+    compactor.start()
+    return compactor
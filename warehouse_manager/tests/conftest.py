@@ -1,18 +1,22 @@
 from typing import Generator
 import pytest
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, delete, event, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import ProgrammingError
 import os
 from fastapi.testclient import TestClient
 
+from warehouse_manager import catalog, idempotency
 from warehouse_manager.app import app
 from warehouse_manager.database import Base
 from warehouse_manager.endpoints import get_db
+from warehouse_manager.models import IdempotencyKey
 from warehouse_manager.tests.factories import (
     ProductFactory,
     OrderFactory,
     OrderItemFactory,
+    WarehouseFactory,
+    WarehouseStockFactory,
 )
 
 
@@ -24,7 +28,7 @@ admin_engine = create_engine(
 )
 engine = create_engine(TEST_DB_URL)
 TestingSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
 )
 
 
@@ -44,7 +48,10 @@ def db_session():
     """yields a SQLAlchemy connection which is rollbacked after the test"""
     connection = engine.connect()
     transaction = connection.begin()
-    session_ = TestingSessionLocal(bind=connection)
+    # rollback in tested code returns to savepoint, not out of the test
+    session_ = TestingSessionLocal(
+        bind=connection, join_transaction_mode="create_savepoint"
+    )
 
     yield session_
 
@@ -53,6 +60,24 @@ def db_session():
     connection.close()
 
 
+@pytest.fixture(scope="function")
+def statements(db_session: Session) -> Generator[list[str], None, None]:
+    """
+    yields list of statements executed while test runs (savepoints
+    of test session are left out), clear it before measured requests
+    """
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith(("SAVEPOINT", "RELEASE", "ROLLBACK")):
+            executed.append(statement)
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", record)
+    yield executed
+    event.remove(bind, "before_cursor_execute", record)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
     """
@@ -71,15 +96,47 @@ def set_session_for_factories(db_session: Session):
     ProductFactory._meta.sqlalchemy_session = db_session
     OrderFactory._meta.sqlalchemy_session = db_session
     OrderItemFactory._meta.sqlalchemy_session = db_session
+    WarehouseFactory._meta.sqlalchemy_session = db_session
+    WarehouseStockFactory._meta.sqlalchemy_session = db_session
 
 
 @pytest.fixture(scope="function")
-def client(db_session: Session) -> Generator[TestClient, None, None]:
+def client(
+    db_session: Session, monkeypatch
+) -> Generator[TestClient, None, None]:
     def get_db_override():
         yield db_session
 
     app.dependency_overrides[get_db] = get_db_override
+    # empty snapshot without rebuilder: its own sessions don't see
+    # uncommitted test data, pages are built by reads of test session
+    monkeypatch.setattr(
+        catalog,
+        "snapshot",
+        catalog.CatalogSnapshot(
+            max_pages=catalog.snapshot.max_pages,
+            ttl=catalog.snapshot.ttl,
+            rebuild_interval=0,
+        ),
+    )
 
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def idempotency_store(
+    monkeypatch,
+) -> Generator[idempotency.IdempotencyStore, None, None]:
+    """
+    yields idempotency store using test database, its keys are committed
+    by own sessions (outside of test transaction) and removed after test
+    """
+    monkeypatch.setattr(
+        idempotency.store, "session_factory", TestingSessionLocal
+    )
+    yield idempotency.store
+    with TestingSessionLocal() as db:
+        db.execute(delete(IdempotencyKey))
+        db.commit()
@@ -1,6 +1,12 @@
 import factory
 
-from warehouse_manager.models import Product, Order, OrderItem
+from warehouse_manager.models import (
+    Product,
+    Order,
+    OrderItem,
+    Warehouse,
+    WarehouseStock,
+)
 
 
 class UniqueFaker(factory.Faker):
@@ -34,3 +40,25 @@ class OrderItemFactory(factory.alchemy.SQLAlchemyModelFactory):
     class Meta:
         model = OrderItem
         sqlalchemy_session_persistence = "commit"
+
+    unit_price = factory.Faker(
+        "pyfloat", positive=True, max_value=50000, right_digits=2
+    )
+
+
+class WarehouseFactory(factory.alchemy.SQLAlchemyModelFactory):
+    class Meta:
+        model = Warehouse
+        sqlalchemy_session_persistence = "commit"
+
+    name = factory.Sequence(lambda n: f"warehouse {n}")
+    latitude = factory.Faker("pyfloat", min_value=-90, max_value=90)
+    longitude = factory.Faker("pyfloat", min_value=-180, max_value=180)
+
+
+class WarehouseStockFactory(factory.alchemy.SQLAlchemyModelFactory):
+    class Meta:
+        model = WarehouseStock
+        sqlalchemy_session_persistence = "commit"
+
+    quantity = factory.Faker("pyint", min_value=0, max_value=100)
@@ -0,0 +1,142 @@
+import json
+import time
+from collections import Counter
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import DBAPIError
+
+from warehouse_manager import endpoints, profiling, slow_queries
+from .conftest import engine
+from .factories import ProductFactory
+
+
+@pytest.fixture
+def admin_token(monkeypatch) -> str:
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "secret")
+    return "secret"
+
+
+@pytest.fixture
+def profile_store(monkeypatch, tmp_path) -> profiling.ProfileStore:
+    store = profiling.ProfileStore(str(tmp_path), keep=2)
+    monkeypatch.setattr(profiling, "store", store)
+    return store
+
+
+@pytest.fixture
+def slow_query_log(monkeypatch) -> slow_queries.SlowQueryLog:
+    log = slow_queries.SlowQueryLog(
+        threshold_ms=0, capacity=5, explain_sample_rate=1
+    )
+    monkeypatch.setattr(slow_queries, "log", log)
+    log.install(engine)
+    yield log
+    log.uninstall(engine)
+
+
+def busy_loop(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_stack_sampler():
+    sampler = profiling.StackSampler(interval=0.001)
+    sampler.start()
+    busy_loop(0.05)
+    sampler.stop()
+    sampler.join()
+
+    assert any("busy_loop" in stack for stack in sampler.stacks)
+
+
+def test_profile_store_keeps_recent(profile_store: profiling.ProfileStore):
+    for i in range(3):
+        profile_store.save("GET", f"/products/{i}/", 0.01, Counter({"a;b": 1}))
+        time.sleep(0.001)
+
+    profiles = profile_store.list()
+    assert len(profiles) == 2
+    assert "products_2" in profiles[0].name
+    assert profile_store.path(profiles[0].name)
+    assert not profile_store.path("../" + profiles[0].name)
+
+
+def test_admin_requires_token(client: TestClient, admin_token: str):
+    response = client.get("/admin/profiles/")
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+    response = client.get(
+        "/admin/profiles/", headers={"X-Admin-Token": "wrong"}
+    )
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+def test_read_profiles(
+    client: TestClient,
+    admin_token: str,
+    profile_store: profiling.ProfileStore,
+):
+    name = profile_store.save("GET", "/products/", 0.01, Counter({"a;b": 3}))
+    headers = {"X-Admin-Token": admin_token}
+
+    response = client.get("/admin/profiles/", headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    assert [p["name"] for p in json.loads(response.content)] == [name]
+
+    response = client.get(f"/admin/profiles/{name}", headers=headers)
+    assert response.content == b"a;b 3\n"
+
+
+def test_slow_query_log(
+    client: TestClient,
+    admin_token: str,
+    slow_query_log: slow_queries.SlowQueryLog,
+):
+    product_id = ProductFactory().id
+    slow_query_log.clear()
+
+    client.get(f"/products/{product_id}/")
+
+    response = client.get(
+        "/admin/slow-queries/", headers={"X-Admin-Token": admin_token}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    # savepoint is opened by test session, not the app
+    records = [
+        record
+        for record in json.loads(response.content)
+        if not record["statement"].startswith("SAVEPOINT")
+    ]
+    assert len(records) == 1
+    assert records[0]["route"] == f"GET /products/{product_id}/"
+    assert records[0]["crud_function"] == "get_product_by_id"
+    assert records[0]["parameters"] == {"product_id": "<int>"}
+    assert "Execution Time" in records[0]["explain"]
+
+
+def test_slow_query_log_bounded(slow_query_log: slow_queries.SlowQueryLog):
+    with engine.connect() as connection:
+        for i in range(10):
+            connection.exec_driver_sql("SELECT 1")
+
+    assert len(slow_query_log.records()) == 5
+    assert not slow_query_log.records()[0].crud_function
+
+
+def test_slow_query_log_errors(slow_query_log: slow_queries.SlowQueryLog):
+    with engine.connect() as connection:
+        for i in range(3):
+            with pytest.raises(DBAPIError):
+                connection.exec_driver_sql("SELECT 1 / 0")
+            connection.rollback()
+        assert connection.info["query_started"] == []
+
+        # locking read is only planned, not run again
+        connection.exec_driver_sql("SELECT id FROM product FOR UPDATE")
+        explain = slow_query_log.records()[0].explain
+        assert "LockRows" in explain
+        assert "Execution Time" not in explain
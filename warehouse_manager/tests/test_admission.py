@@ -0,0 +1,139 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import httpx
+from fastapi.testclient import TestClient
+
+from warehouse_manager import admission, endpoints
+from warehouse_manager.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    RouteClass,
+)
+
+
+def make_controller(limit: int = 2, queue: int = 1) -> AdmissionController:
+    return AdmissionController.for_pool(
+        pool_size=limit,
+        queue_factor=queue / limit,
+        queue_timeout=0.2,
+        read_share=0.5,
+    )
+
+
+def test_overload_rejected_with_retry_after():
+    controller = make_controller(limit=2, queue=2)
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    app = AdmissionMiddleware(slow_app, controller, retry_after=3)
+
+    async def overload():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            requests = [
+                asyncio.create_task(client.post("/orders/", json={}))
+                for i in range(6)
+            ]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(overload())
+    statuses = [response.status_code for response in responses]
+
+    # 2 handled at once, 2 waited in queue, the rest failed fast
+    assert statuses.count(HTTPStatus.OK) == 4
+    assert statuses.count(HTTPStatus.SERVICE_UNAVAILABLE) == 2
+    rejected = statuses.index(HTTPStatus.SERVICE_UNAVAILABLE)
+    assert responses[rejected].headers["Retry-After"] == "3"
+
+    stats = controller.stats[RouteClass.order_create]
+    assert stats.rejected == 2
+    assert stats.queued == 2
+    assert stats.in_flight == 0
+    assert stats.queue_depth == 0
+
+
+def test_queue_timeout():
+    controller = make_controller(limit=1, queue=1)
+
+    async def wait_too_long():
+        assert await controller.acquire(RouteClass.write)
+        return await controller.acquire(RouteClass.write)
+
+    assert not asyncio.run(wait_too_long())
+    assert controller.stats[RouteClass.write].timed_out == 1
+
+
+def test_order_creation_admitted_first():
+    controller = make_controller(limit=1, queue=5)
+    admitted = []
+
+    async def request(route_class: RouteClass):
+        await controller.acquire(route_class)
+        admitted.append(route_class)
+        await asyncio.sleep(0)
+        controller.release(route_class)
+
+    async def run():
+        await controller.acquire(RouteClass.write)
+        tasks = [
+            asyncio.create_task(request(RouteClass.read)),
+            asyncio.create_task(request(RouteClass.write)),
+            asyncio.create_task(request(RouteClass.order_create)),
+        ]
+        await asyncio.sleep(0)
+        controller.release(RouteClass.write)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert admitted == [
+        RouteClass.order_create,
+        RouteClass.write,
+        RouteClass.read,
+    ]
+
+
+def test_reads_leave_room_for_writes():
+    controller = make_controller(limit=4, queue=4)
+
+    async def run():
+        assert await controller.acquire(RouteClass.read)
+        assert await controller.acquire(RouteClass.read)
+        read = asyncio.create_task(controller.acquire(RouteClass.read))
+        await asyncio.sleep(0)
+        # reads may take only half of connections
+        assert not read.done()
+        assert await controller.acquire(RouteClass.order_create)
+        controller.release(RouteClass.read)
+        assert await read
+
+    asyncio.run(run())
+
+
+def test_classify():
+    assert admission.classify("POST", "/orders/") == RouteClass.order_create
+    assert admission.classify("PATCH", "/orders/1/") == RouteClass.write
+    assert admission.classify("GET", "/products/") == RouteClass.read
+    assert admission.classify("POST", "/products/lookup/") == RouteClass.read
+    assert admission.classify("GET", "/admin/profiles/") is None
+
+
+def test_read_admission_metrics(client: TestClient, monkeypatch):
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "secret")
+
+    response = client.get(
+        "/admin/metrics/admission/", headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    metrics = json.loads(response.content)
+    assert set(metrics["classes"]) == {"order_create", "write", "read"}
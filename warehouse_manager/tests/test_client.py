@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import warehouse_client
+from warehouse_client import AsyncClient, Client, NotFound, RetryPolicy
+from warehouse_manager import schemas
+from warehouse_manager.app import app
+from .factories import ProductFactory
+
+
+class CountingTransport(httpx.ASGITransport):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.paths = []
+
+    async def handle_async_request(self, request):
+        self.paths.append(request.url.path)
+        return await super().handle_async_request(request)
+
+
+@pytest.mark.parametrize(
+    "model, schema",
+    [
+        (warehouse_client.Product, schemas.Product),
+        (warehouse_client.ProductCreate, schemas.ProductCreate),
+        (warehouse_client.Order, schemas.Order),
+        (warehouse_client.OrderCreate, schemas.OrderCreate),
+        (warehouse_client.OrderItem, schemas.OrderItem),
+        (warehouse_client.OrderItemCreate, schemas.OrderItemCreate),
+    ],
+)
+def test_models_aligned(model, schema):
+    assert set(model.model_fields) == set(schema.model_fields)
+
+
+def test_sync_client(client: TestClient, idempotency_store):
+    api = Client(http=client)
+    created = api.create_product(
+        {"name": "sofa", "description": "-", "price": 1, "stock_quantity": 5}
+    )
+    products = [created] + [
+        api.get_product(ProductFactory().id) for i in "ab"
+    ]
+
+    assert api.get_product(created.id) == created
+    with pytest.raises(NotFound):
+        api.get_product(999)
+
+    lookup = api.get_products([products[1].id, 999, products[0].id])
+    assert lookup.items == [products[1], products[0]]
+    assert lookup.missing == [999]
+
+    assert list(api.iter_products(page_size=2)) == products
+
+    order = api.create_order(
+        {"items": [{"product_id": created.id, "quantity": 1}]}
+    )
+    assert list(api.iter_orders(page_size=1)) == [order]
+
+
+def test_async_client_batches_reads(client: TestClient):
+    products = [ProductFactory() for i in "abc"]
+    transport = CountingTransport(app=app)
+
+    async def run():
+        async with AsyncClient(
+            "http://test", transport=transport, batch_window=0
+        ) as api:
+            found = await asyncio.gather(
+                *(api.get_product(p.id) for p in products)
+            )
+            with pytest.raises(NotFound):
+                await api.get_product(999)
+            listed = [p async for p in api.iter_products(page_size=2)]
+            return found, listed
+
+    found, listed = asyncio.run(run())
+    assert [p.id for p in found] == [p.id for p in products]
+    assert listed == found
+    assert transport.paths == [
+        "/products/lookup/",
+        "/products/lookup/",
+        "/products/",
+        "/products/",
+    ]
+
+
+def test_async_client_retries_overloaded():
+    responses = iter(
+        [
+            httpx.Response(503, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={"items": [], "missing": [1]}),
+        ]
+    )
+    transport = httpx.MockTransport(lambda request: next(responses))
+
+    async def run():
+        async with AsyncClient("http://test", transport=transport) as api:
+            return await api.get_products([1])
+
+    assert asyncio.run(run()).missing == [1]
+
+
+def test_retry_policy():
+    policy = RetryPolicy(attempts=3, backoff=0.1, max_delay=5)
+    overloaded = httpx.Response(503, headers={"Retry-After": "60"})
+    bad_gateway = httpx.Response(502)
+
+    assert policy.delay(0, idempotent=True) == 0.1
+    assert policy.delay(1, idempotent=True, response=bad_gateway) == 0.2
+    assert policy.delay(2, idempotent=True) is None
+    assert policy.delay(0, idempotent=False) is None
+    assert policy.delay(0, idempotent=False, response=bad_gateway) is None
+    assert policy.delay(0, idempotent=False, response=overloaded) == 5
+    assert policy.delay(0, True, httpx.Response(400)) is None
+    assert policy.delay(0, True, httpx.Response(409)) == 0.1
@@ -0,0 +1,78 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from warehouse_manager import endpoints
+from warehouse_manager.coalescing import SingleFlight
+
+
+def test_concurrent_calls_share_result():
+    flight = SingleFlight(max_keys=10)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"[]"
+
+    async def run():
+        return await asyncio.gather(
+            *[flight.do(("products", 0, 100), load) for i in range(10)],
+            flight.do(("product", 1), load),
+        )
+
+    results = asyncio.run(run())
+    assert results == [b"[]"] * 11
+    assert len(calls) == 2
+    assert flight.stats.leaders == 2
+    assert flight.stats.followers == 9
+    assert flight.stats.ratio == pytest.approx(9 / 11)
+    assert flight.in_flight == 0
+
+
+def test_concurrent_calls_share_exception():
+    flight = SingleFlight(max_keys=10)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise LookupError("Product not found")
+
+    async def run():
+        return await asyncio.gather(
+            *[flight.do(("product", 1), load) for i in range(3)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, LookupError) for result in results)
+    assert flight.stats.leaders == 1
+
+
+def test_key_table_bounded():
+    flight = SingleFlight(max_keys=1)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", load), flight.do("b", load), flight.do("b", load)
+        )
+
+    assert asyncio.run(run()) == [1, 1, 1]
+    assert flight.stats.bypassed == 2
+
+
+def test_read_coalescing_metrics(client: TestClient, monkeypatch):
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "secret")
+    client.get("/products/1/")
+
+    response = client.get(
+        "/admin/metrics/coalescing/", headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert json.loads(response.content)["leaders"] >= 1
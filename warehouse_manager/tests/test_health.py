@@ -0,0 +1,34 @@
+from http import HTTPStatus
+
+from fastapi.testclient import TestClient
+
+from warehouse_manager import warmup
+from .conftest import TestingSessionLocal, engine
+
+
+def test_live(client: TestClient):
+    response = client.get("/health/live")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["status"] == "alive"
+
+
+def test_ready(monkeypatch, client: TestClient):
+    # warmed up on startup of client
+    response = client.get("/health/ready")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["status"] == "ready"
+
+    monkeypatch.setattr(warmup.state, "ready", False)
+    monkeypatch.setattr(warmup.state, "run", lambda *args: False)
+    response = client.get("/health/ready")
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def test_warmup_opens_connections():
+    engine.dispose()
+    state = warmup.Warmup(connections=2)
+
+    assert state.run(engine, TestingSessionLocal)
+    assert state.ready
+    assert state.duration > 0
+    assert engine.pool.checkedin() == 2
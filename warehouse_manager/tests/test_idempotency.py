@@ -0,0 +1,227 @@
+import asyncio
+import time
+from http import HTTPStatus
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.types import Message
+
+from warehouse_manager import idempotency
+from warehouse_manager.app import app
+from warehouse_manager.models import Order, Product
+from .conftest import TestingSessionLocal
+from .factories import ProductFactory
+
+
+def _order_data(product: Product, quantity: int = 1) -> dict:
+    return {
+        "status": "",
+        "items": [{"product_id": product.id, "quantity": quantity}],
+    }
+
+
+async def _call(app_, key: str, send_=None) -> list[Message]:
+    """
+    :param send_: replaces sending of messages to client
+    :return: messages sent by idempotency middleware wrapping app_
+    to POST /orders with key
+    """
+
+    middleware = idempotency.IdempotencyMiddleware(
+        app_, idempotency.store, wait_timeout=0, poll_interval=0.01
+    )
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/orders",
+        "query_string": b"",
+        "headers": [(b"idempotency-key", key.encode())],
+    }
+    messages = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    await middleware(scope, receive, send_ or send)
+    return messages
+
+
+def test_replay(
+    db_session: Session, client: TestClient, idempotency_store
+):
+    product = ProductFactory(stock_quantity=10)
+    headers = {"Idempotency-Key": "order-1"}
+
+    first = client.post("/orders/", json=_order_data(product), headers=headers)
+    assert first.status_code == HTTPStatus.OK
+    assert "Idempotent-Replayed" not in first.headers
+
+    replay = client.post(
+        "/orders/", json=_order_data(product), headers=headers
+    )
+    assert replay.status_code == HTTPStatus.OK
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.headers["Content-Type"] == first.headers["Content-Type"]
+    assert replay.json() == first.json()
+
+    assert len(db_session.execute(select(Order)).all()) == 1
+    db_session.expire_all()
+    assert db_session.get(Product, product.id).stock_quantity == 9
+
+    response = client.post(
+        "/orders/", json=_order_data(product, 2), headers=headers
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_concurrent_duplicates(
+    db_session: Session, client: TestClient, idempotency_store
+):
+    product = ProductFactory(stock_quantity=10)
+
+    async def run():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as http:
+            return await asyncio.gather(
+                *(
+                    http.post(
+                        "/orders/",
+                        json=_order_data(product),
+                        headers={"Idempotency-Key": "order-2"},
+                    )
+                    for i in range(5)
+                )
+            )
+
+    responses = asyncio.run(run())
+    assert {r.status_code for r in responses} == {HTTPStatus.OK}
+    assert len({r.content for r in responses}) == 1
+    assert sum("Idempotent-Replayed" in r.headers for r in responses) == 4
+    assert len(db_session.execute(select(Order)).all()) == 1
+
+
+def test_bulk_replay(
+    db_session: Session, client: TestClient, idempotency_store
+):
+    product = ProductFactory(stock_quantity=10)
+    data = {"ids": [product.id], "stock": {"increment": 5}}
+    headers = {"Idempotency-Key": "adjust-1"}
+
+    for i in range(2):
+        response = client.post("/products/adjust/", json=data, headers=headers)
+        assert response.json()["affected"] == 1
+    db_session.expire_all()
+    assert db_session.get(Product, product.id).stock_quantity == 15
+
+
+def test_store(idempotency_store):
+    store = idempotency_store
+    assert store.claim("key", "a") is None
+    assert store.claim("key", "a") == idempotency.Outcome(
+        "a", None, None, None
+    )
+
+    # failed request frees key for retry
+    store.release("key")
+    assert store.claim("key", "a") is None
+    headers = [(b"content-type", b"application/json")]
+    store.complete("key", 200, b"{}", headers)
+    assert store.claim("key", "b") == idempotency.Outcome(
+        "a", 200, b"{}", headers
+    )
+
+
+def test_store_expiry(monkeypatch, idempotency_store):
+    store = idempotency_store
+    monkeypatch.setattr(store, "ttl", 0)
+    monkeypatch.setattr(store, "lock_timeout", 0)
+    assert store.claim("done", "a") is None
+    store.complete("done", 200, b"{}", [])
+    assert store.claim("stale", "a") is None
+    time.sleep(0.01)
+
+    # expired and abandoned keys can be claimed again
+    assert store.claim("done", "b") is None
+    assert store.claim("stale", "b") is None
+    time.sleep(0.01)
+    with TestingSessionLocal() as db:
+        assert idempotency.purge_expired(db) == 2
+
+
+def test_failed_request(idempotency_store):
+    async def unavailable(scope, receive, send):
+        await send({"type": "http.response.start", "status": 503})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def broken(scope, receive, send):
+        raise RuntimeError
+
+    # key of request failed with 5xx response is released for retry
+    asyncio.run(_call(unavailable, "failed"))
+    assert idempotency_store.claim("failed", "a") is None
+
+    # request ended without response may have committed its changes,
+    # key is held until lock timeout
+    with pytest.raises(RuntimeError):
+        asyncio.run(_call(broken, "broken"))
+    assert idempotency_store.claim("broken", "a").status_code is None
+
+
+def test_replay_streamed(idempotency_store):
+    received = []
+
+    async def streaming(scope, receive, send):
+        received.append(await receive())
+        received.append(await receive())
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 201,
+                "headers": [(b"location", b"/orders/1")],
+            }
+        )
+        await send(
+            {"type": "http.response.body", "body": b"{", "more_body": True}
+        )
+        await send({"type": "http.response.body", "body": b"}"})
+
+    asyncio.run(_call(streaming, "streamed"))
+    # body of request is received once, then client is gone
+    assert [m["type"] for m in received] == [
+        "http.request",
+        "http.disconnect",
+    ]
+
+    start, body = asyncio.run(_call(streaming, "streamed"))
+    assert len(received) == 2
+    assert start["status"] == 201
+    assert start["headers"] == [
+        (b"location", b"/orders/1"),
+        (b"idempotent-replayed", b"true"),
+    ]
+    assert body["body"] == b"{}"
+
+
+def test_response_not_sent(idempotency_store):
+    async def streaming(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200})
+        await send(
+            {"type": "http.response.body", "body": b"{", "more_body": True}
+        )
+        await send({"type": "http.response.body", "body": b"}"})
+
+    async def disconnected(message: Message) -> None:
+        if message["type"] == "http.response.body":
+            raise OSError
+
+    # partial body isn't stored, key is held until lock timeout
+    with pytest.raises(OSError):
+        asyncio.run(_call(streaming, "partial", disconnected))
+    assert idempotency_store.claim("partial", "a").status_code is None
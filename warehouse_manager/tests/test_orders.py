@@ -1,11 +1,19 @@
 import json
+import threading
 from http import HTTPStatus
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 from fastapi.testclient import TestClient
+from .conftest import TestingSessionLocal
 from .factories import ProductFactory, OrderFactory, OrderItemFactory
 
-from warehouse_manager.models import Order, Product, OrderStatusEnum
+from warehouse_manager import crud, endpoints, schemas
+from warehouse_manager.models import (
+    Order,
+    OrderItem,
+    OrderStatusEnum,
+    Product,
+)
 
 
 def test_post_valid(db_session: Session, client: TestClient):
@@ -22,6 +30,7 @@ def test_post_valid(db_session: Session, client: TestClient):
     response = client.post("/orders/", json=order_data)
     assert response.status_code == HTTPStatus.OK
 
+    db_session.expire_all()
     db_product = db_session.execute(
         select(Product).where(Product.id == db_product.id)
     ).scalar()
@@ -35,6 +44,12 @@ def test_post_valid(db_session: Session, client: TestClient):
     assert db_order.items[0].quantity == order_data["items"][0]["quantity"]
     assert len(db_session.execute(select(Order)).all()) == 1
 
+    # created order is returned with its id
+    response_order = response.json()
+    assert response_order["id"] == db_order.id
+    assert response_order["items"][0]["id"] == db_order.items[0].id
+    assert response_order["items"][0]["order_id"] == db_order.id
+
 
 def test_read_orders_default(client: TestClient):
     db_product = ProductFactory()
@@ -61,6 +76,21 @@ def test_read_orders_set_limit(client: TestClient):
     assert len(response_list) == 20
 
 
+def test_read_orders_paginated(db_session: Session, client: TestClient):
+    orders = [OrderFactory() for i in range(6)]
+    # rewritten rows move to the end of table
+    for order in orders[:3]:
+        order.status = OrderStatusEnum.sent
+    db_session.flush()
+
+    pages = [
+        client.get("/orders/", params={"skip": skip, "limit": 3}).json()
+        for skip in (0, 3)
+    ]
+    ids = [order["id"] for page in pages for order in page]
+    assert ids == [order.id for order in orders]
+
+
 def test_read_order_exists(client: TestClient):
     product1 = ProductFactory()
     product2 = ProductFactory()
@@ -103,3 +133,192 @@ def test_patch_order_status_not_exists(
 ):
     response = client.patch("/orders/1/", params={"status": "sent"})
     assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_lookup_orders(client: TestClient):
+    product = ProductFactory()
+    order1 = OrderFactory()
+    order2 = OrderFactory()
+    OrderItemFactory(order_id=order1.id, product_id=product.id, quantity=1)
+    OrderItemFactory(order_id=order2.id, product_id=product.id, quantity=2)
+
+    response = client.post(
+        "/orders/lookup/", json={"ids": [order2.id, 999, order1.id]}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    lookup = json.loads(response.content)
+    assert [o["id"] for o in lookup["items"]] == [order2.id, order1.id]
+    assert lookup["items"][0]["items"][0]["quantity"] == 2
+    assert lookup["missing"] == [999]
+
+    response = client.get("/orders/", params={"ids": [order1.id, 999]})
+    assert [o["id"] for o in json.loads(response.content)] == [order1.id]
+    assert response.headers["X-Missing-Ids"] == "999"
+
+
+def test_order_totals(db_session: Session, client: TestClient):
+    sofa = ProductFactory(price=10.5, stock_quantity=10)
+    chair = ProductFactory(price=2, stock_quantity=10)
+    order_data = {
+        "status": "",
+        "items": [
+            {"product_id": sofa.id, "quantity": 2},
+            {"product_id": chair.id, "quantity": 3},
+        ],
+    }
+
+    response = client.post("/orders/", json=order_data)
+    assert response.status_code == HTTPStatus.OK
+    order = response.json()
+    assert (order["total_price"], order["item_count"]) == (27, 5)
+    assert sorted(item["unit_price"] for item in order["items"]) == [2, 10.5]
+
+    # price changes don't affect created orders
+    client.patch(f"/products/{sofa.id}/", json={"price": 100})
+    db_session.expire_all()
+    order = client.get(f"/orders/{order['id']}/").json()
+    assert (order["total_price"], order["item_count"]) == (27, 5)
+    listed = client.get("/orders/").json()
+    assert listed[0]["total_price"] == 27
+
+
+def test_write_statement_counts(client: TestClient, statements: list[str]):
+    product = ProductFactory(stock_quantity=10)
+    order_data = {
+        "status": "",
+        "items": [{"product_id": product.id, "quantity": 1}],
+    }
+
+    statements.clear()
+    response = client.post("/orders/", json=order_data)
+    assert response.status_code == HTTPStatus.OK
+    # order, locked warehouse stock, stock decrement, items
+    assert len(statements) == 4
+
+    order_id = client.get("/orders/").json()[0]["id"]
+    statements.clear()
+    response = client.patch(f"/orders/{order_id}/", params={"status": "sent"})
+    assert response.json()["items"][0]["product_id"] == product.id
+    # update and items
+    assert len(statements) == 2
+
+
+def test_bulk_status_by_ids(
+    monkeypatch,
+    db_session: Session,
+    client: TestClient,
+    statements: list[str],
+):
+    monkeypatch.setattr(endpoints, "BULK_CHUNK_SIZE", 2)
+    processed = [OrderFactory(status=OrderStatusEnum.processed) for i in "ab"]
+    sent = OrderFactory(status=OrderStatusEnum.sent)
+    delivered = OrderFactory(status=OrderStatusEnum.delivered)
+    ids = [p.id for p in processed] + [sent.id, delivered.id, 999]
+
+    statements.clear()
+    response = client.post(
+        "/orders/status/", json={"status": "sent", "ids": ids}
+    )
+    assert response.status_code == HTTPStatus.OK
+    # one statement per chunk
+    assert len(statements) == 3
+
+    assert response.json() == {
+        "updated": [p.id for p in processed],
+        "skipped": [sent.id, delivered.id],
+        "missing": [999],
+    }
+    db_session.expire_all()
+    statuses = {o["id"]: o["status"] for o in client.get("/orders/").json()}
+    assert statuses[processed[0].id] == OrderStatusEnum.sent.value
+    assert statuses[delivered.id] == OrderStatusEnum.delivered.value
+
+
+def test_bulk_status_by_filter(monkeypatch, client: TestClient):
+    monkeypatch.setattr(endpoints, "BULK_CHUNK_SIZE", 2)
+    sent = [OrderFactory(status=OrderStatusEnum.sent) for i in "abc"]
+    OrderFactory(status=OrderStatusEnum.processed)
+
+    response = client.post(
+        "/orders/status/",
+        json={"status": "delivered", "filter": {"status": "sent"}},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        "updated": [o.id for o in sent],
+        "skipped": [],
+        "missing": [],
+    }
+
+
+def test_bulk_status_invalid(client: TestClient):
+    for body in (
+        {"status": "lost", "ids": [1]},
+        {"status": "sent"},
+        {"status": "sent", "ids": [1], "filter": {}},
+        {"status": "sent", "filter": {"status": "lost"}},
+    ):
+        response = client.post("/orders/status/", json=body)
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_create_orders_concurrently(db_session: Session):
+    # committed by own sessions, so that concurrent transactions see them
+    with TestingSessionLocal() as db:
+        products = [
+            Product(
+                name=f"concurrent-{i}",
+                description="-",
+                price=1,
+                stock_quantity=100,
+            )
+            for i in range(50)
+        ]
+        db.add_all(products)
+        db.commit()
+        ids = [product.id for product in products]
+
+    # the same products in opposite orders
+    orders = [
+        schemas.OrderCreate(
+            status="",
+            items=[
+                {"product_id": pk, "quantity": 1}
+                for pk in (ids if i % 2 else ids[::-1])
+            ],
+        )
+        for i in range(8)
+    ]
+    start = threading.Barrier(len(orders))
+    errors = []
+
+    def create(order: schemas.OrderCreate):
+        start.wait()
+        try:
+            for _ in range(10):
+                with TestingSessionLocal() as db:
+                    assert crud.create_order(db, order)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=create, args=(o,)) for o in orders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert errors == []
+        stmt = select(Product.stock_quantity).where(Product.id.in_(ids))
+        assert db_session.execute(stmt).scalars().all() == [20] * 50
+    finally:
+        with TestingSessionLocal() as db:
+            order_ids = db.execute(
+                delete(OrderItem)
+                .where(OrderItem.product_id.in_(ids))
+                .returning(OrderItem.order_id)
+            ).scalars()
+            db.execute(delete(Order).where(Order.id.in_(set(order_ids))))
+            db.execute(delete(Product).where(Product.id.in_(ids)))
+            db.commit()
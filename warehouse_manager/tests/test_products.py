@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 import json
 from fastapi.testclient import TestClient
 
+from warehouse_manager import catalog, crud, endpoints, stock_ledger
 from warehouse_manager.models import Product
 from .factories import ProductFactory
 
@@ -160,5 +161,331 @@ def test_delete(db_session: Session, client: TestClient):
 
     assert response.status_code == HTTPStatus.OK
 
+    # soft-deleted, hidden from reads
+    db_session.expire_all()
+    assert db_session.get(Product, db_product.id).deleted_at is not None
+    response = client.get(f"/products/{db_product.id}/")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    response = client.get("/products/")
+    assert db_product.id not in [p["id"] for p in response.json()]
+    response = client.delete(f"/products/{db_product.id}")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    # name can be reused
+    response = client.post(
+        "/products/",
+        json={"name": db_product.name, "description": "new", "price": 1},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_purge_deleted(db_session: Session, client: TestClient):
+    unordered = [ProductFactory().id, ProductFactory().id]
+    ordered = ProductFactory(stock_quantity=10)
+    live = ProductFactory()
+    response = client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [{"product_id": ordered.id, "quantity": 1}],
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+    for product_id in (*unordered, ordered.id):
+        client.delete(f"/products/{product_id}/")
+
+    # batches smaller than count of deleted products
+    assert crud.purge_deleted_products(
+        db_session, older_than=0, batch_size=2
+    ) == (2, 1)
+
+    db_session.expire_all()
+    assert all(db_session.get(Product, pk) is None for pk in unordered)
+    assert db_session.get(Product, live.id).deleted_at is None
+    anonymized = db_session.get(Product, ordered.id)
+    assert anonymized.name == f"deleted-{ordered.id}"
+    assert anonymized.purged_at is not None
+
+
+def test_read_products_by_ids(client: TestClient):
+    db_product1 = ProductFactory()
+    db_product2 = ProductFactory()
+
+    response = client.get(
+        "/products/", params={"ids": [db_product2.id, 999, db_product1.id]}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response_list = json.loads(response.content)
+    assert [p["id"] for p in response_list] == [
+        db_product2.id,
+        db_product1.id,
+    ]
+    assert response.headers["X-Missing-Ids"] == "999"
+
+
+def test_lookup_products(client: TestClient):
+    db_product1 = ProductFactory()
+    db_product2 = ProductFactory()
+
+    response = client.post(
+        "/products/lookup/",
+        json={"ids": [db_product2.id, 999, db_product1.id, db_product2.id]},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    lookup = json.loads(response.content)
+    assert [p["id"] for p in lookup["items"]] == [
+        db_product2.id,
+        db_product1.id,
+    ]
+    assert lookup["missing"] == [999]
+
+
+def test_lookup_products_too_many_ids(client: TestClient):
+    response = client.post(
+        "/products/lookup/", json={"ids": list(range(1, 1000))}
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_read_products_snapshot(client: TestClient):
+    for i in range(20):
+        ProductFactory()
+
+    response = client.get("/products/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(response.content)) == 20
+
+    etag = response.headers["ETag"]
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_read_products_snapshot_invalidated(client: TestClient):
+    db_product = ProductFactory(name="sofa")
+
+    response = client.get("/products/")
+    assert json.loads(response.content)[0]["name"] == "sofa"
+    etag = response.headers["ETag"]
+
+    update_data = {
+        "name": "chair",
+        "description": "some chair",
+        "price": 780.5,
+        "stock_quantity": 100,
+    }
+    client.put(f"/products/{db_product.id}/", json=update_data)
+
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.OK
+    assert json.loads(response.content)[0]["name"] == "chair"
+
+
+def test_read_products_snapshot_rebuilt(
+    db_session: Session, client: TestClient, statements: list[str]
+):
+    db_product = ProductFactory(name="sofa", stock_quantity=10)
+    etag = client.get("/products/").headers["ETag"]
+
+    response = client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [{"product_id": db_product.id, "quantity": 1}],
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+    client.patch(f"/products/{db_product.id}/", json={"name": "chair"})
+    # one rebuild for both changes, own session of rebuilder is fresh
+    db_session.expire_all()
+    fetch = endpoints._fetch_catalog_page(db_session)
+    assert catalog.snapshot.rebuild_stale(fetch) == 1
+    assert catalog.snapshot.rebuild_stale(fetch) == 0
+
+    statements.clear()
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert statements == []
+    assert response.status_code == HTTPStatus.OK
+    product = json.loads(response.content)[0]
+    assert (product["name"], product["stock_quantity"]) == ("chair", 9)
+
+
+def test_update_if_match(db_session: Session, client: TestClient):
+    db_product = ProductFactory(name="sofa")
+
+    etag = client.get(f"/products/{db_product.id}/").headers["ETag"]
+    update_data = {
+        "name": "chair",
+        "description": "some chair",
+        "price": 780.5,
+        "stock_quantity": 100,
+    }
+
+    response = client.put(
+        f"/products/{db_product.id}/",
+        json=update_data,
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+    assert json.loads(response.content)["version"] == 2
+
+    update_data["name"] = "table"
+    response = client.put(
+        f"/products/{db_product.id}/",
+        json=update_data,
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+
     stmt = select(Product).where(Product.id == db_product.id)
-    assert not db_session.execute(stmt).one_or_none()
+    assert db_session.execute(stmt).scalar().name == "chair"
+
+
+def test_patch_product(db_session: Session, client: TestClient):
+    db_product = ProductFactory(name="sofa", price=100, stock_quantity=5)
+
+    response = client.patch(
+        f"/products/{db_product.id}/",
+        json={"price": 120},
+        headers={"If-Match": '"1"'},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response_product = json.loads(response.content)
+    assert response_product["name"] == "sofa"
+    assert response_product["price"] == 120
+    assert response_product["stock_quantity"] == 5
+    assert response.headers["ETag"] == '"2"'
+
+
+def test_put_resets_omitted(client: TestClient):
+    db_product = ProductFactory(stock_quantity=5)
+
+    response = client.put(
+        f"/products/{db_product.id}/",
+        json={"name": "chair", "description": "-", "price": 10},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["stock_quantity"] == 0
+
+
+def test_patch_empty(client: TestClient):
+    db_product = ProductFactory()
+
+    for data in ({}, {"name": None}):
+        response = client.patch(f"/products/{db_product.id}/", json=data)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+    response = client.get(f"/products/{db_product.id}/")
+    assert response.headers["ETag"] == '"1"'
+
+
+def test_patch_not_exists(client: TestClient):
+    response = client.patch("/products/1/", json={"price": 120})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_write_statement_counts(client: TestClient, statements: list[str]):
+    product = ProductFactory()
+    data = {"name": "chair", "description": "some chair", "price": 10}
+
+    statements.clear()
+    assert client.post("/products/", json=data).status_code == HTTPStatus.OK
+    assert len(statements) == 1
+    assert statements[0].startswith("INSERT")
+
+    statements.clear()
+    client.post("/products/", json=data)
+    assert len(statements) == 1
+
+    statements.clear()
+    client.put(f"/products/{product.id}/", json=data | {"name": "table"})
+    assert len(statements) == 1
+
+    statements.clear()
+    client.patch(f"/products/{product.id}/", json={"price": 20})
+    assert len(statements) == 1
+
+    statements.clear()
+    client.delete(f"/products/{product.id}/")
+    assert len(statements) == 1
+
+
+def test_adjust_by_ids(
+    monkeypatch,
+    db_session: Session,
+    client: TestClient,
+    statements: list[str],
+):
+    monkeypatch.setattr(endpoints, "BULK_CHUNK_SIZE", 2)
+    products = [ProductFactory(stock_quantity=5, price=10) for i in "ab"]
+    short = ProductFactory(stock_quantity=1, price=10)
+    ids = [p.id for p in products] + [short.id, 999]
+    version = products[0].version
+
+    statements.clear()
+    response = client.post(
+        "/products/adjust/",
+        json={
+            "ids": ids,
+            "stock": {"increment": -2},
+            "price": {"set": 12.5},
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+    # one statement per chunk
+    assert len(statements) == 2
+    assert response.json() == {
+        "affected": 2,
+        "skipped": [short.id],
+        "missing": [999],
+        "dry_run": False,
+    }
+
+    db_session.expire_all()
+    adjusted = db_session.get(Product, products[0].id)
+    assert (adjusted.stock_quantity, float(adjusted.price)) == (3, 12.5)
+    assert adjusted.version == version + 1
+    skipped = db_session.get(Product, short.id)
+    assert (skipped.stock_quantity, float(skipped.price)) == (1, 10)
+
+
+def test_adjust_by_filter(db_session: Session, client: TestClient):
+    cheap = [ProductFactory(price=10) for i in "abc"]
+    expensive = ProductFactory(price=100)
+    data = {"filter": {"price_to": 50}, "price": {"percent": 15}}
+
+    response = client.post("/products/adjust/", json=data | {"dry_run": True})
+    assert response.json() == {
+        "affected": 3,
+        "skipped": [],
+        "missing": [],
+        "dry_run": True,
+    }
+    db_session.expire_all()
+    assert float(db_session.get(Product, cheap[0].id).price) == 10
+
+    response = client.post("/products/adjust/", json=data)
+    assert response.json()["affected"] == 3
+    db_session.expire_all()
+    assert float(db_session.get(Product, cheap[0].id).price) == 11.5
+    assert float(db_session.get(Product, expensive.id).price) == 100
+
+
+def test_adjust_invalid(monkeypatch, client: TestClient):
+    for data in (
+        {"ids": [1], "filter": {}, "price": {"set": 1}},
+        {"ids": [1]},
+        {"ids": [1], "stock": {"set": 1, "increment": 1}},
+        {"ids": [1], "price": {"percent": -100}},
+    ):
+        response = client.post("/products/adjust/", json=data)
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    monkeypatch.setattr(stock_ledger.ledger, "enabled", True)
+    response = client.post(
+        "/products/adjust/", json={"ids": [1], "stock": {"set": 1}}
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from warehouse_manager import endpoints, stock_ledger
+from warehouse_manager.models import Product, StockMovement, StockSnapshot
+from .factories import ProductFactory
+
+
+@pytest.fixture
+def ledger(monkeypatch) -> stock_ledger.StockLedger:
+    monkeypatch.setattr(stock_ledger.ledger, "enabled", True)
+    return stock_ledger.ledger
+
+
+@pytest.fixture
+def admin_token(monkeypatch) -> str:
+    monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "secret")
+    return "secret"
+
+
+def _order(client: TestClient, product_id: int, quantity: int):
+    return client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [{"product_id": product_id, "quantity": quantity}],
+        },
+    )
+
+
+def _stock(client: TestClient, product_id: int, **params) -> dict:
+    response = client.get(f"/products/{product_id}/stock/", params=params)
+    assert response.status_code == HTTPStatus.OK
+    return response.json()
+
+
+def test_order_appends_movement(
+    db_session: Session, client: TestClient, ledger
+):
+    product = ProductFactory(stock_quantity=10)
+
+    assert _order(client, product.id, 4).status_code == HTTPStatus.OK
+
+    # product row isn't rewritten by order
+    db_session.expire_all()
+    stmt = select(Product.stock_quantity).where(Product.id == product.id)
+    assert db_session.execute(stmt).scalar() == 10
+    movement = db_session.execute(select(StockMovement)).scalar_one()
+    assert (movement.product_id, movement.delta) == (product.id, -4)
+    assert movement.order_id is not None
+
+    # but all reads show current stock
+    assert _stock(client, product.id)["quantity"] == 6
+    response = client.get(f"/products/{product.id}/")
+    assert response.json()["stock_quantity"] == 6
+    response = client.get("/products/")
+    assert response.json()[0]["stock_quantity"] == 6
+    response = client.post("/products/lookup/", json={"ids": [product.id]})
+    assert response.json()["items"][0]["stock_quantity"] == 6
+
+    response = _order(client, product.id, 7)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert _stock(client, product.id)["quantity"] == 6
+
+
+def test_order_changes_version(client: TestClient, ledger):
+    product = ProductFactory(stock_quantity=10)
+    etag = client.get(f"/products/{product.id}/").headers["ETag"]
+
+    _order(client, product.id, 3)
+    response = client.get(f"/products/{product.id}/")
+    assert response.headers["ETag"] != etag
+
+    # write based on read from before the order is rejected
+    response = client.put(
+        f"/products/{product.id}/",
+        json={
+            "name": product.name,
+            "description": product.description,
+            "price": float(product.price),
+            "stock_quantity": 10,
+        },
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert _stock(client, product.id)["quantity"] == 7
+
+
+def test_update_appends_adjustment(
+    db_session: Session, client: TestClient, ledger
+):
+    product = ProductFactory(stock_quantity=10)
+    _order(client, product.id, 4)
+
+    response = client.patch(
+        f"/products/{product.id}/", json={"stock_quantity": 3}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["stock_quantity"] == 3
+    response = client.patch(f"/products/{product.id}/", json={"price": 5})
+    assert response.json()["stock_quantity"] == 3
+
+    assert _stock(client, product.id)["quantity"] == 3
+    deltas = db_session.execute(
+        select(StockMovement.delta).order_by(StockMovement.id)
+    ).scalars()
+    assert list(deltas) == [-4, -3]
+
+
+def test_compaction(
+    db_session: Session, client: TestClient, ledger, admin_token: str
+):
+    product = ProductFactory(stock_quantity=10)
+    _order(client, product.id, 4)
+    before = datetime.now(timezone.utc) - timedelta(hours=1)
+    etag = client.get(f"/products/{product.id}/").headers["ETag"]
+
+    response = client.post(
+        "/admin/inventory/compact/",
+        params={"retention": 0},
+        headers={"X-Admin-Token": admin_token},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"products": 1}
+
+    db_session.expire_all()
+    assert db_session.get(Product, product.id).stock_quantity == 6
+    assert not db_session.execute(select(StockMovement)).all()
+    snapshot = db_session.execute(select(StockSnapshot)).scalar_one()
+    assert (snapshot.product_id, snapshot.quantity) == (product.id, 6)
+    # current stock didn't change, neither did version
+    response = client.get(f"/products/{product.id}/")
+    assert response.json()["stock_quantity"] == 6
+    assert response.headers["ETag"] == etag
+
+    later = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert _stock(client, product.id, at=later.isoformat()) == {
+        "product_id": product.id,
+        "quantity": 6,
+        "exact": True,
+    }
+    # no history before the first snapshot
+    response = client.get(
+        f"/products/{product.id}/stock/", params={"at": before.isoformat()}
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_stock_at_snapshot(db_session: Session, ledger):
+    product = ProductFactory(stock_quantity=10)
+    moment = datetime.now() - timedelta(hours=1)
+    db_session.add_all(
+        [
+            StockSnapshot(
+                product_id=product.id,
+                quantity=8,
+                horizon=moment - timedelta(hours=1),
+            ),
+            StockSnapshot(
+                product_id=product.id,
+                quantity=10,
+                horizon=moment + timedelta(minutes=30),
+            ),
+        ]
+    )
+    db_session.flush()
+
+    level = ledger.at(db_session, product.id, moment)
+    assert (level.quantity, level.exact) == (8, False)
+
+
+def test_stock_history_requires_ledger(client: TestClient):
+    product = ProductFactory(stock_quantity=10)
+
+    assert _stock(client, product.id)["quantity"] == 10
+    response = client.get(
+        f"/products/{product.id}/stock/",
+        params={"at": datetime.now(timezone.utc).isoformat()},
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    response = client.get(f"/products/{product.id + 1}/stock/")
+    assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,225 @@
+from http import HTTPStatus
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from warehouse_manager import inventory, schemas
+from warehouse_manager.models import Order, OrderItem, Product, WarehouseStock
+from .factories import ProductFactory, WarehouseFactory, WarehouseStockFactory
+
+
+# Moscow, Saint Petersburg and Novosibirsk
+MOSCOW = {"latitude": 55.75, "longitude": 37.62}
+SAINT_PETERSBURG = {"latitude": 59.94, "longitude": 30.31}
+NOVOSIBIRSK = {"latitude": 55.03, "longitude": 82.92}
+
+
+def _stock(db_session: Session, warehouse_id: int, product_id: int) -> int:
+    return db_session.execute(
+        select(WarehouseStock.quantity).where(
+            WarehouseStock.warehouse_id == warehouse_id,
+            WarehouseStock.product_id == product_id,
+        )
+    ).scalar_one()
+
+
+def _order_items(db_session: Session) -> list[tuple[int | None, int]]:
+    db_order = db_session.execute(select(Order)).scalar_one()
+    return sorted(
+        (item.warehouse_id, item.quantity)
+        for item in db_session.execute(
+            select(OrderItem).where(OrderItem.order_id == db_order.id)
+        ).scalars()
+    )
+
+
+def test_create_warehouse(client: TestClient):
+    response = client.post(
+        "/warehouses/", json={"name": "central", **MOSCOW, "priority": 1}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["name"] == "central"
+    assert response.json()["priority"] == 1
+
+    response = client.post("/warehouses/", json={"name": "central"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    response = client.get("/warehouses/")
+    assert [w["name"] for w in response.json()] == ["central"]
+
+
+def test_set_warehouse_stock(db_session: Session, client: TestClient):
+    warehouse = WarehouseFactory()
+    product = ProductFactory()
+    url = f"/warehouses/{warehouse.id}/stock/"
+
+    response = client.put(url, json={"product_id": product.id, "quantity": 5})
+    assert response.status_code == HTTPStatus.OK
+    response = client.put(url, json={"product_id": product.id, "quantity": 7})
+    assert response.json() == {
+        "warehouse_id": warehouse.id,
+        "product_id": product.id,
+        "quantity": 7,
+    }
+    assert client.get(url).json() == [response.json()]
+
+    response = client.put(url, json={"product_id": product.id, "quantity": -1})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    response = client.put(
+        url, json={"product_id": product.id + 1, "quantity": 1}
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    response = client.get(f"/warehouses/{warehouse.id + 1}/stock/")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_write_statement_counts(client: TestClient, statements: list[str]):
+    product = ProductFactory()
+
+    statements.clear()
+    response = client.post("/warehouses/", json={"name": "central"})
+    assert len(statements) == 1
+
+    statements.clear()
+    client.put(
+        f"/warehouses/{response.json()['id']}/stock/",
+        json={"product_id": product.id, "quantity": 5},
+    )
+    assert len(statements) == 1
+
+
+def test_order_from_nearest_warehouse(db_session: Session, client: TestClient):
+    moscow = WarehouseFactory(**MOSCOW)
+    novosibirsk = WarehouseFactory(**NOVOSIBIRSK)
+    product = ProductFactory()
+    WarehouseStockFactory(
+        warehouse_id=moscow.id, product_id=product.id, quantity=10
+    )
+    WarehouseStockFactory(
+        warehouse_id=novosibirsk.id, product_id=product.id, quantity=10
+    )
+
+    response = client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [{"product_id": product.id, "quantity": 4}],
+            "ship_to": SAINT_PETERSBURG,
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    assert _order_items(db_session) == [(moscow.id, 4)]
+    assert _stock(db_session, moscow.id, product.id) == 6
+    assert _stock(db_session, novosibirsk.id, product.id) == 10
+
+
+def test_order_split_between_warehouses(
+    db_session: Session, client: TestClient
+):
+    moscow = WarehouseFactory(**MOSCOW)
+    novosibirsk = WarehouseFactory(**NOVOSIBIRSK)
+    product = ProductFactory()
+    WarehouseStockFactory(
+        warehouse_id=moscow.id, product_id=product.id, quantity=3
+    )
+    WarehouseStockFactory(
+        warehouse_id=novosibirsk.id, product_id=product.id, quantity=10
+    )
+
+    response = client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [{"product_id": product.id, "quantity": 5}],
+            "ship_to": SAINT_PETERSBURG,
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    assert _order_items(db_session) == sorted(
+        [(moscow.id, 3), (novosibirsk.id, 2)]
+    )
+    assert _stock(db_session, moscow.id, product.id) == 0
+    assert _stock(db_session, novosibirsk.id, product.id) == 8
+
+
+def test_order_not_enough_stock(db_session: Session, client: TestClient):
+    warehouse = WarehouseFactory()
+    product = ProductFactory()
+    legacy_product = ProductFactory(stock_quantity=10)
+    WarehouseStockFactory(
+        warehouse_id=warehouse.id, product_id=product.id, quantity=3
+    )
+
+    response = client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [
+                {"product_id": legacy_product.id, "quantity": 2},
+                {"product_id": product.id, "quantity": 4},
+            ],
+        },
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    # nothing is taken from stock
+    assert not db_session.execute(select(Order)).all()
+    assert _stock(db_session, warehouse.id, product.id) == 3
+    assert (
+        db_session.execute(
+            select(Product.stock_quantity).where(
+                Product.id == legacy_product.id
+            )
+        ).scalar_one()
+        == 10
+    )
+
+
+def test_order_without_warehouse_stock(
+    db_session: Session, client: TestClient
+):
+    product = ProductFactory(stock_quantity=10)
+
+    response = client.post(
+        "/orders/",
+        json={
+            "status": "",
+            "items": [
+                {"product_id": product.id, "quantity": 3},
+                {"product_id": product.id, "quantity": 4},
+            ],
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    assert _order_items(db_session) == [(None, 7)]
+    db_session.expire_all()
+    assert db_session.get(Product, product.id).stock_quantity == 3
+
+
+def test_allocation_strategies():
+    near_small = inventory._Candidate(1, quantity=2, priority=1, distance=10)
+    far_large = inventory._Candidate(2, quantity=10, priority=0, distance=90)
+    candidates = [near_small, far_large]
+
+    def allocate(strategy):
+        return [
+            (a.warehouse_id, a.quantity)
+            for a in inventory._allocate_product(7, 5, candidates, strategy)
+        ]
+
+    assert allocate(inventory.Strategy.nearest) == [(1, 2), (2, 3)]
+    assert allocate(inventory.Strategy.fewest_splits) == [(2, 5)]
+    assert allocate(inventory.Strategy.priority) == [(2, 5)]
+    assert not inventory._allocate_product(
+        7, 13, candidates, inventory.Strategy.nearest
+    )
+
+
+def test_distance():
+    location = schemas.Location(**MOSCOW)
+    assert 600 < inventory._distance(location, **SAINT_PETERSBURG) < 700
+    assert inventory._distance(None, **MOSCOW) == float("inf")
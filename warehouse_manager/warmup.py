@@ -0,0 +1,78 @@
+import logging
+import time
+from typing import Callable
+
+from sqlalchemy import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, configure_mappers
+
+from . import crud
+from .settings import DB_POOL_SIZE, WARMUP_CONNECTIONS, WARMUP_ENABLED
+
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Pays one-time costs of worker before it reports readiness, instead
+    of its first requests: opens pool connections (TCP and auth),
+    configures mappers and compiles hot queries into statement cache.
+    """
+
+    def __init__(self, connections: int, enabled: bool = True):
+        self.connections = connections
+        self.enabled = enabled
+        self.ready = False
+        # seconds warm-up took
+        self.duration: float | None = None
+
+    def run(
+        self, engine: Engine, session_factory: Callable[[], Session]
+    ) -> bool:
+        """
+        :param engine: engine whose pool is filled
+        :param session_factory: factory of session hot queries run in
+        :return: True if worker is warmed up, False if database
+        is unreachable (warm-up is to be retried)
+        """
+
+        if not self.enabled:
+            self.ready = True
+            return True
+
+        started = time.perf_counter()
+        try:
+            configure_mappers()
+            # held at once, so each of them is a new pool connection
+            connections = [
+                engine.connect()
+                for _ in range(min(self.connections, DB_POOL_SIZE))
+            ]
+            for connection in connections:
+                connection.close()
+            with session_factory() as db:
+                _hot_queries(db)
+        except SQLAlchemyError:
+            logger.exception("Warm-up failed")
+            return False
+
+        self.duration = time.perf_counter() - started
+        self.ready = True
+        logger.info("Warmed up in %.3f s", self.duration)
+        return True
+
+
+def _hot_queries(db: Session) -> None:
+    """Run hot crud queries once, without changing anything"""
+
+    crud.get_product_by_id(db, 0)
+    crud.get_product_quantity(db, 0)
+    crud.get_products(db, limit=1)
+    crud.get_products_by_ids(db, [0])
+    crud.get_order_by_id(db, 0)
+    crud.get_orders(db, limit=1).all()
+    crud.get_orders_by_ids(db, [0])
+
+
+state = Warmup(connections=WARMUP_CONNECTIONS, enabled=WARMUP_ENABLED)